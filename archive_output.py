@@ -0,0 +1,125 @@
+import io
+import sys
+import gzip
+import socket
+import tarfile
+import zipfile
+
+# 再現可能なアーカイブにするため、タイムスタンプと所有者を固定する（zipが表現できる最小の日時）
+ARCHIVE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ARCHIVE_MTIME = 315532800
+FILE_MODE = 0o644
+DIR_MODE = 0o755
+
+FORMATS = ('tar', 'tar.gz', 'tar.zst', 'zip')
+
+
+def detect_format(target):
+    for fmt in ('tar.zst', 'tar.gz', 'zip', 'tar'):
+        if target.endswith('.' + fmt):
+            return fmt
+    if target.endswith('.tgz'):
+        return 'tar.gz'
+    return 'tar.zst'
+
+
+def open_output(target):
+    # '-' は標準出力、tcp://host:port はソケット、それ以外はファイルとして開く
+    if target == '-':
+        return sys.stdout.buffer, False
+    if target.startswith('tcp://'):
+        host, port = target[len('tcp://'):].rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)))
+        stream = sock.makefile('wb')
+        sock.close()
+        return stream, True
+    return open(target, 'wb'), True
+
+
+def archive_entries(files, prefix=''):
+    # パスの順序を固定し、親ディレクトリのエントリも含める
+    paths = {prefix + path: content for path, content in files.items()}
+    directories = set()
+    for path in paths:
+        parts = path.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            directories.add('/'.join(parts[:i]) + '/')
+    entries = [(directory, None) for directory in directories]
+    entries.extend(paths.items())
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def write_tar(entries, stream):
+    # 'w|' はシーク不要のストリームモード（標準出力やソケットにそのまま書ける）
+    with tarfile.open(fileobj=stream, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+        for name, content in entries:
+            info = tarfile.TarInfo(name.rstrip('/'))
+            info.mtime = ARCHIVE_MTIME
+            info.uid = info.gid = 0
+            info.uname = info.gname = ''
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                info.mode = DIR_MODE
+                tar.addfile(info)
+                continue
+            data = content if isinstance(content, bytes) else content.encode('utf-8')
+            info.mode = FILE_MODE
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+class StreamOnly:
+    # seek/tell を持たないラッパー。zipfile はシークできる出力ではデータ記述子を省くため、
+    # ファイルでも標準出力やソケットでも同じバイト列になるよう常にストリームとして書かせる
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def write_zip(entries, stream):
+    with zipfile.ZipFile(StreamOnly(stream), 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries:
+            info = zipfile.ZipInfo(name, date_time=ARCHIVE_DATE_TIME)
+            info.create_system = 3
+            if content is None:
+                info.external_attr = (0o40000 | DIR_MODE) << 16
+                archive.writestr(info, b'')
+                continue
+            info.external_attr = FILE_MODE << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content if isinstance(content, bytes) else content.encode('utf-8'))
+
+
+def check_format(fmt):
+    # 出力先を開く前に、形式と必要なライブラリを確認する
+    if fmt not in FORMATS:
+        raise ValueError(f"未対応のアーカイブ形式です: {fmt}（{', '.join(FORMATS)} のいずれか）")
+    if fmt == 'tar.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("tar.zst形式で出力するには zstandard が必要です: pip install zstandard")
+
+
+def write_archive(files, stream, fmt='tar.zst', prefix=''):
+    # files はパスと内容（文字列またはバイト列）の辞書。ディスクには一切書き出さずにアーカイブをストリームへ流す
+    check_format(fmt)
+    entries = archive_entries(files, prefix)
+    if fmt == 'zip':
+        write_zip(entries, stream)
+    elif fmt == 'tar':
+        write_tar(entries, stream)
+    elif fmt == 'tar.gz':
+        with gzip.GzipFile(fileobj=stream, mode='wb', mtime=0, filename='') as compressed:
+            write_tar(entries, compressed)
+    else:
+        import zstandard
+        with zstandard.ZstdCompressor().stream_writer(stream, closefd=False) as compressed:
+            write_tar(entries, compressed)
+    stream.flush()
@@ -0,0 +1,57 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from create_pages import create_nextjs_structure
+
+
+def build_manifest(total_routes, sections=100):
+    # セクションごとに共通レイアウトを割り当て、動的セグメントを含むルートを大量に生成する
+    per_section = max(1, total_routes // sections)
+    layouts = {f'section{i % 10}': {'before': ['Sidebar'], 'className': 'flex'} for i in range(10)}
+    routes = []
+    for s in range(sections):
+        children = []
+        for r in range(per_section - 1):
+            if r == 0:
+                # Next.js は同じ階層に動的セグメントを1つしか置けないため、各セクションに1つだけ作る
+                children.append({'segment': '[item]', 'title': 'Item {item}'})
+            else:
+                children.append({'segment': f'page-{r}', 'title': f'Section {s} Page {r}'})
+        routes.append({
+            'segment': f'section-{s}',
+            'title': f'Section {s}',
+            'layout': f'section{s % 10}',
+            'children': children,
+        })
+    return {
+        'extension': 'tsx',
+        'components': {'Sidebar': {'tag': 'nav', 'text': 'Sidebar'}},
+        'layouts': layouts,
+        'routes': routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="create_pages のルート生成ベンチマーク")
+    parser.add_argument('--routes', type=int, default=10000, help="生成するルート数")
+    parser.add_argument('--keep', action='store_true', help="生成したディレクトリを削除しない")
+    args = parser.parse_args()
+
+    manifest = build_manifest(args.routes)
+    out_dir = tempfile.mkdtemp(prefix='bench-pages-')
+    try:
+        start = time.perf_counter()
+        files = create_nextjs_structure(base_dir=out_dir, skip_setup=True, manifest=manifest)
+        elapsed = time.perf_counter() - start
+        print(f"{len(files)} files / {elapsed:.2f}s ({len(files) / elapsed:.0f} files/s)")
+    finally:
+        if args.keep:
+            print(f"出力先: {out_dir}")
+        else:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,91 @@ import re
 import subprocess
 import os
 import sys
+import threading
 import json
 import time
 import shutil
-from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 from rich import print as rprint
 import requests
 from dotenv import load_dotenv
 import asyncio
-from create_project_files import create_project_files, create_file
-
-console = Console()
+import argparse
+from create_project_files import create_project_files, create_file, project_templates
+from fonts import resolve_local_font
+from template_registry import template_hashes
+from events import emit, configure_output, WARNING, MESSAGE, OUTPUT_MODES, console
+from deploy_matrix import (build_prebuilt, push_targets, primary_url, print_matrix_results,
+                           parse_targets, parse_alias, DEFAULT_TARGETS)
+from loadtest import run_load_test_gate, LoadTestError, DEFAULT_CONCURRENCY, DEFAULT_DURATION, DEFAULT_THRESHOLD
+from checkpoint import Checkpoint, PHASES, fingerprint, file_hash, tree_hash
+from watch import watch_project
+from command_runner import run_command, kill_process_tree_async, cancel_all
+
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Next.js + Supabase プロジェクトを生成してVercelにデプロイします")
+    parser.add_argument('options', nargs='*', help="no: JavaScriptで生成, watch: ウォッチモード")
+    parser.add_argument('--from', dest='restart_from', choices=PHASES, help="指定したフェーズから強制的にやり直す")
+    parser.add_argument('--output', choices=OUTPUT_MODES, default=os.getenv('ZOLTRAAK_OUTPUT', 'console'),
+                        help="進捗の表示方法（live は対話入力のない実行向け、json は1行1イベント、null は表示なし）")
+    parser.add_argument('--loadtest', action='store_true', help="デプロイ前に next start に負荷をかけ、レイテンシが悪化していればデプロイを中止する")
+    parser.add_argument('--loadtest-concurrency', type=int, default=DEFAULT_CONCURRENCY, help="負荷テストの同時接続数")
+    parser.add_argument('--loadtest-duration', type=float, default=DEFAULT_DURATION, help="負荷テストの実行時間（秒）")
+    parser.add_argument('--loadtest-threshold', type=float, default=DEFAULT_THRESHOLD, help="前回の結果に対して許容する悪化の割合")
+    parser.add_argument('--matrix', nargs='?', type=parse_targets, const=list(DEFAULT_TARGETS),
+                        help="1回のビルドを複数のターゲットへ同時にデプロイする（カンマ区切り、省略時は preview,staging,production）")
+    parser.add_argument('--alias', action='append', type=parse_alias, default=[],
+                        help="ターゲットに割り当てるドメイン（例: staging=staging.example.com、複数指定可）")
+    parser.add_argument('--persist', action='store_true', help="タスクを localStorage に保存するミドルウェアを生成する")
+    parser.add_argument('--font', help="サブセット化して同梱するフォント（省略時は Noto Sans JP / Noto Sans CJK を探す）")
+    parser.add_argument('--google-font', action='store_true',
+                        help="フォントを同梱せず next/font/google を使う（ビルド時にネットワークが必要）")
+    parser.add_argument('--events-file', help="すべてのイベントをJSON Lines形式で追記するファイル")
+    options = parser.parse_args(argv)
+    if options.alias and not options.matrix:
+        parser.error("--alias は --matrix と一緒に指定してください。")
+    unknown = [target for target, _ in options.alias if target not in (options.matrix or [])]
+    if unknown:
+        parser.error(f"--alias のターゲットが --matrix に含まれていません: {', '.join(unknown)}")
+    if options.font and not os.path.isfile(options.font):
+        parser.error(f"フォントが見つかりません: {options.font}")
+    return options
 
 
 async def main():
+    try:
+        await run_build()
+    except BaseException:
+        # Ctrl+C などで中断された場合、バックグラウンドのスレッドで実行中のコマンドをここで止める。
+        # そうしないと asyncio.run がスレッドの終了（コマンドの完了かタイムアウト）を待ち続ける
+        cancel_all()
+        raise
+
+
+async def run_build():
     # PROJECT_NAME = input("プロジェクト名を入力してください: ")
     PROJECT_NAME = "frontend-next"
-    USE_TYPESCRIPT = len(sys.argv) <= 1 or sys.argv[1].lower() != 'no'
-
+    options = parse_args()
+    configure_output(options.output, options.events_file)
+    args = [arg.lower() for arg in options.options]
+    USE_TYPESCRIPT = 'no' not in args
+    WATCH_MODE = 'watch' in args
+    features = {'persist'} if options.persist else set()
+    # UIの文字だけに絞ったフォントを同梱し、ビルド時にGoogle Fontsを取得しないようにする
+    font_source = resolve_local_font(options.font, options.google_font)
+    if font_source:
+        features.add('local_font')
+    root_dir = os.getcwd()
 
-    # 環境変数の読み込み
-    load_env_variables()
     # プロジェクト情報の取得
     project_id, vercel_project_name = get_project_info(PROJECT_NAME)
 
+    # 環境変数の読み込みと資格情報の入力は、以下のファイル生成・インストールと並行して行う
+    credentials = asyncio.create_task(collect_credentials(project_id, root_dir))
+
     # # プロジェクトディレクトリの準備
     # if os.path.exists(PROJECT_NAME):
     #     console.print(f"[yellow]{PROJECT_NAME}ディレクトリが既に存在します。削除します...[/yellow]")
@@ -49,25 +108,36 @@ async def main():
     # プロジェクトディレクトリに移動
     os.chdir(PROJECT_NAME)
 
-    # プロジェクトファイルの作成
-    create_project_files(PROJECT_NAME, USE_TYPESCRIPT)
+    # 前回の実行状態（入力のフィンガープリント）を読み込み、変更のないフェーズはスキップする
+    checkpoint = Checkpoint(restart_from=options.restart_from)
+
+    # 資格情報を必要としない処理（ファイル生成・package.json・npm install・型チェック）をバックグラウンドで開始する
+    preparation = asyncio.create_task(asyncio.to_thread(prepare_project, checkpoint, PROJECT_NAME, USE_TYPESCRIPT, features, font_source))
 
-    # package.jsonの更新
-    update_package_json()
+    # ウォッチモード: 開発サーバーを起動し、テンプレートと.env.localの変更分だけを再生成する
+    if WATCH_MODE:
+        await asyncio.gather(preparation, credentials)
+        await watch_mode(USE_TYPESCRIPT, features, font_source)
+        return
 
     # ローカル開発サーバーの起動
-    console.print(Panel("[bold yellow]ステップ 1: ローカル開発サーバーを起動します[/bold yellow]"))
+    emit(MESSAGE, level='banner', text="ステップ 1: ローカル開発サーバーを起動します")
     # dev_process = await run_local_dev(PROJECT_NAME)
 
-    console.print(Panel(
-        "[bold green]ステップ 2: 開発サーバーが起動しました。\n"
+    emit(MESSAGE, level='banner', text=(
+        "ステップ 2: 開発サーバーが起動しました。\n"
         "以下のURLでアクセスできます：\n"
         "http://localhost:3000\n\n"
-        "サーバーを停止するには、Ctrl+C を押してください。[/bold green]"
+        "サーバーを停止するには、Ctrl+C を押してください。"
     ))
 
-    # Supabaseのセットアップ
-    supabase_url, supabase_anon_key, callback_url = setup_supabase(project_id)
+    # Supabaseのセットアップ（資格情報の入力完了を待つ）
+    supabase_url, supabase_anon_key, callback_url = await credentials
+
+    # ビルド以降は資格情報と事前準備の両方が揃ってから行う。
+    # generate フェーズが ../.env.local をコピーするため、.env.local はその後に書き込む
+    if not await preparation:
+        emit(WARNING, message="事前準備（インストール・型チェック）に失敗しました。デプロイ時に再実行します。")
 
     # .env.localファイルの作成（Supabase情報がある場合）
     if supabase_url and supabase_anon_key and callback_url:
@@ -78,7 +148,22 @@ NEXT_PUBLIC_SUPABASE_CALLBACK_URL={callback_url}
         """.strip())
 
     # Vercelへのデプロイ
-    deploy_url = deploy_to_vercel(supabase_url, supabase_anon_key, vercel_project_name) if supabase_url and supabase_anon_key else None
+    load_test = {
+        'concurrency': options.loadtest_concurrency,
+        'duration': options.loadtest_duration,
+        'threshold': options.loadtest_threshold,
+    } if options.loadtest else None
+    matrix = None
+    if not (supabase_url and supabase_anon_key):
+        deploy_url = None
+    elif options.matrix:
+        # ビルドは1回だけ行い、成果物をすべてのターゲットへ同時にデプロイする
+        matrix = deploy_to_vercel(supabase_url, supabase_anon_key, vercel_project_name, checkpoint, load_test,
+                                  targets=options.matrix, aliases=dict(options.alias))
+        deploy_urls = matrix['deploy_urls'] if matrix else {}
+        deploy_url = primary_url(deploy_urls)
+    else:
+        deploy_url = deploy_to_vercel(supabase_url, supabase_anon_key, vercel_project_name, checkpoint, load_test)
 
     if deploy_url:
         # .env.localファイルから情報を読み込む
@@ -94,13 +179,27 @@ NEXT_PUBLIC_SUPABASE_CALLBACK_URL={callback_url}
         # APIキーを抽出
         supabase_api_key = re.search(r'NEXT_PUBLIC_SUPABASE_ANON_KEY=(.*)', env_content).group(1)
         
-        console.print(f"[green]SupabaseプロジェクトID: {supabase_project_id}[/green]")
-        console.print(f"[green]Supabase管理APIキー: {supabase_api_key}[/green]")
+        emit(MESSAGE, level='success', text=f"SupabaseプロジェクトID: {supabase_project_id}")
+        emit(MESSAGE, level='success', text=f"Supabase管理APIキー: {supabase_api_key}")
         callback_url = f"{deploy_url}/auth/callback"
-        update_supabase_settings(supabase_project_id, supabase_api_key, deploy_url, callback_url)
+        # マトリクスの場合、ターゲットは同じSupabaseプロジェクトを共有する。設定はPATCHごとに置き換わるため、
+        # ターゲットごとに並行して送ると互いに上書きしてしまう。全ターゲットのコールバックURLを1回でまとめて登録する
+        callback_urls = [f"{url}/auth/callback" for url in deploy_urls.values()] if matrix else [callback_url]
+        settings = checkpoint.run(
+            'supabase_settings',
+            lambda: fingerprint(checkpoint.fingerprint_of('deploy'), supabase_project_id, supabase_api_key, deploy_url, callback_urls),
+            lambda: {} if update_supabase_settings(supabase_project_id, supabase_api_key, deploy_url, callback_urls) else None,
+        )
+        if matrix:
+            print_matrix_results(matrix['results'], settings is not None)
+        if matrix and matrix.get('failed'):
+            emit(WARNING, message="Supabaseの認証設定には、デプロイに成功したターゲットのコールバックURLだけを登録しました。")
 
         console.print("\n[bold cyan]Google Cloud Consoleでの設定:[/bold cyan]")
-        console.print(f"[cyan]Google Cloud Consoleで、承認済みの���ダイレクトURIに {callback_url} を追加してください。[/cyan]")
+        for callback_url in callback_urls:
+            console.print(f"[cyan]Google Cloud Consoleで、承認済みの���ダイレクトURIに {callback_url} を追加してください。[/cyan]")
+    elif matrix:
+        print_matrix_results(matrix['results'])
 
     # README.mdの作成
     create_readme(PROJECT_NAME, deploy_url)
@@ -119,14 +218,77 @@ NEXT_PUBLIC_SUPABASE_CALLBACK_URL={callback_url}
 supabase_url = None
 supabase_anon_key = None
 
-def load_env_variables():
+async def ainput(prompt):
+    # イベントループを止めないよう input() はデーモンスレッドで待つ。
+    # asyncio.to_thread のスレッドは終了時に待ち合わされるため、Ctrl+C しても Enter が押されるまで終了できない
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(setter, value):
+        if not future.done():
+            setter(value)
+
+    def read():
+        try:
+            # プロンプトは標準エラーに出し、--output json の標準出力をJSON Linesだけに保つ
+            sys.stderr.write(prompt)
+            sys.stderr.flush()
+            line = input()
+        except BaseException as e:
+            callback = (resolve, future.set_exception, e)
+        else:
+            callback = (resolve, future.set_result, line)
+        try:
+            loop.call_soon_threadsafe(*callback)
+        except RuntimeError:
+            # イベントループが既に閉じている（中断後に入力された）
+            pass
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+async def collect_credentials(project_id, root_dir='.'):
+    await load_env_variables(root_dir)
+    return await setup_supabase(project_id)
+
+def prepare_project(checkpoint, PROJECT_NAME, USE_TYPESCRIPT, features=(), font_source=None):
+    # 資格情報に依存しないフェーズ。バックグラウンドのスレッドで実行される
+    try:
+        # プロジェクトファイルの作成
+        checkpoint.run(
+            'generate',
+            lambda: fingerprint(template_hashes(project_templates(features)), USE_TYPESCRIPT, sorted(features),
+                                font_source and file_hash(font_source), file_hash('../.env.local'), tree_hash('app')),
+            lambda: create_project_files(PROJECT_NAME, USE_TYPESCRIPT, features, font_source) or {},
+        )
+
+        # package.jsonの更新
+        checkpoint.run(
+            'package_json',
+            lambda: fingerprint(checkpoint.fingerprint_of('generate'), file_hash('package.json')),
+            lambda: update_package_json() or {},
+        )
+
+        # 依存関係のインストール
+        checkpoint.run('install', lambda: install_inputs(checkpoint), install_dependencies)
+
+        # 暫定の型チェック（環境変数に依存しないため先に実行しておく）
+        return checkpoint.run('typecheck', lambda: typecheck_inputs(checkpoint), type_check) is not None
+    except subprocess.SubprocessError as e:
+        emit(MESSAGE, level='error', text=f"事前準備中にエラーが発生しました: {e}")
+        if e.output:
+            console.print(e.output, markup=False)
+        return False
+
+async def load_env_variables(root_dir='.'):
     global supabase_url, supabase_anon_key
+    env_path = os.path.join(root_dir, '.env.local')
     # .env.localファイルが存在する場合、それを読み込む
-    if os.path.exists('.env.local'):
-        load_dotenv('.env.local')
+    if os.path.exists(env_path):
+        load_dotenv(env_path)
         supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
         supabase_anon_key = os.getenv('NEXT_PUBLIC_SUPABASE_ANON_KEY')
-        console.print("[green].env.localファイルから環境変数を読み込みました。[/green]")
+        emit(MESSAGE, level='success', text=".env.localファイルから環境変数を読み込みました。")
         
         # # frontend-next/ に.env.local をコピーする
         # frontend_next_dir = 'frontend-next'
@@ -137,10 +299,10 @@ def load_env_variables():
         # shutil.copy('.env.local', os.path.join(frontend_next_dir, '.env.local'))
         # console.print("[green].env.localファイルをfrontend-next/ディレクトリにコピーしました。[/green]")
     else:
-        console.print("[yellow].env.localファイルが見つかりません。手動で入力が必要です。[/yellow]")
-        create_env_local_file()
+        emit(WARNING, message=".env.localファイルが見つかりません。手動で入力が必要です。")
+        await create_env_local_file(root_dir)
 
-def create_env_local_file():
+async def create_env_local_file(root_dir='.'):
     global supabase_url, supabase_anon_key
     console.print("[cyan]Supabaseプロジェクトの情報を入力してください。[/cyan]")
     console.print("[cyan]環境変数の取得方法:[/cyan]")
@@ -150,13 +312,13 @@ def create_env_local_file():
     console.print("4. 「プロジェクトURL」と「Project API keys」の「anon public」キーをコピーします。")
 
     while True:
-        supabase_url = input("Project URL を入力してください: ")
+        supabase_url = await ainput("Project URL を入力してください: ")
         if supabase_url.startswith("https://") and supabase_url.endswith(".supabase.co"):
             break
         console.print("[bold red]無効なSupabase URLです。正しいURLを入力してください。[/bold red]")
 
     while True:
-        supabase_anon_key = input("Project API keys の anon public キーを入力してください: ")
+        supabase_anon_key = await ainput("Project API keys の anon public キーを入力してください: ")
         if supabase_anon_key.startswith("eyJ"):
             break
         console.print("[bold red]無効な匿名キーです。正しいキーを入力してください。[/bold red]")
@@ -166,26 +328,31 @@ NEXT_PUBLIC_SUPABASE_URL={supabase_url}
 NEXT_PUBLIC_SUPABASE_ANON_KEY={supabase_anon_key}
     """.strip()
 
-    create_file('frontend-next/.env.local', env_content)
-    console.print("[green]新しい.env.localファイルを作成しました。[/green]")
+    create_file(os.path.join(root_dir, 'frontend-next', '.env.local'), env_content)
+    emit(MESSAGE, level='success', text="新しい.env.localファイルを作成しました。")
 
-async def run_dev_server(project_dir):
-    print(f"現在のファイルパス: {os.getcwd()}")
+async def run_dev_server(project_dir, capture_output=True):
+    emit(MESSAGE, level='info', text=f"現在のファイルパス: {os.getcwd()}")
     # os.chdir(project_dir)
-    console.print(Panel("[bold cyan]ステップ 1: 開発サーバーを起動しています[/bold cyan]"))
+    emit(MESSAGE, level='banner', text="ステップ 1: 開発サーバーを起動しています")
+    # 出力を読まない長時間の実行ではパイプが詰まらないよう端末にそのまま流す
+    output = asyncio.subprocess.PIPE if capture_output else None
     process = await asyncio.create_subprocess_shell(
         "npm run dev",
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
+        stdout=output,
+        stderr=output,
+        start_new_session=True
     )
     return process
 
-async def wait_for_server(url, timeout=60):
-    console.print("[cyan]ステップ 2: サーバーの起動を確認しています...[/cyan]")
+async def wait_for_server(url, timeout=60, request_timeout=5):
+    emit(MESSAGE, level='info', text="ステップ 2: サーバーの起動を確認しています...")
     start_time = time.time()
     while time.time() - start_time < timeout:
         try:
-            response = requests.get(url)
+            # 接続を受け付けても応答しないサーバーで止まらないよう、リクエストごとに制限時間を設け、
+            # イベントループを塞がないよう別スレッドで送る
+            response = await asyncio.to_thread(requests.get, url, timeout=request_timeout)
             if response.status_code == 200:
                 return True
         except requests.RequestException:
@@ -193,18 +360,22 @@ async def wait_for_server(url, timeout=60):
         await asyncio.sleep(1)
     return False
 
-async def run_local_dev(PROJECT_NAME):
-    dev_process = await run_dev_server(PROJECT_NAME)
+async def run_local_dev(PROJECT_NAME, capture_output=True):
+    dev_process = await run_dev_server(PROJECT_NAME, capture_output)
     server_ready = await wait_for_server("http://localhost:3000")
     if server_ready:
-        console.print("[green]ステップ 3: 開発サーバーが正常に起動しました。[/green]")
+        emit(MESSAGE, level='success', text="ステップ 3: 開発サーバーが正常に起動しました。")
     else:
-        console.print("[yellow]ステップ 3: 開発サーバーの起動を確認できませんでした。手動で確認してください。[/yellow]")
+        emit(WARNING, message="ステップ 3: 開発サーバーの起動を確認できませんでした。手動で確認してください。")
     return dev_process
 
-def run_command(command, shell=True):
-    return subprocess.run(command, shell=shell, check=True, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
+async def watch_mode(USE_TYPESCRIPT, features=(), font_source=None):
+    dev_process = await run_local_dev(os.getcwd(), capture_output=False)
+    try:
+        await watch_project(USE_TYPESCRIPT, features=features, font_source=font_source)
+    finally:
+        emit(MESSAGE, level='banner', text="開発サーバーを停止しています...")
+        await kill_process_tree_async(dev_process)
 
 def setup_project(PROJECT_NAME, USE_TYPESCRIPT):
     FILE_EXT = 'ts' if USE_TYPESCRIPT else 'js'
@@ -228,7 +399,7 @@ def setup_project(PROJECT_NAME, USE_TYPESCRIPT):
         transient=True
     ) as progress:
         task1 = progress.add_task("[cyan]Next.jsプロジェクトを作成しています...", total=100)
-        result = run_command(" ".join(create_next_app_command))
+        result = run_command(" ".join(create_next_app_command), step="create-next-app")
         for i in range(100):
             time.sleep(0.1)  # 0.1秒ごとに進捗を更新
             progress.update(task1, advance=1)
@@ -246,7 +417,7 @@ def setup_project(PROJECT_NAME, USE_TYPESCRIPT):
         transient=True
     ) as progress:
         task2 = progress.add_task("[cyan]追加の依存関係をインストールしています...", total=10)
-        result = run_command("npm install @reduxjs/toolkit react-redux @supabase/auth-helpers-nextjs @supabase/auth-helpers-react @supabase/supabase-js framer-motion")
+        result = run_command("npm install @reduxjs/toolkit react-redux @supabase/auth-helpers-nextjs @supabase/auth-helpers-react @supabase/supabase-js framer-motion", step="install-deps")
         for i in range(100):
             time.sleep(0.1)  # 0.1秒ごとに進捗を更新
             progress.update(task2, advance=1)
@@ -270,18 +441,18 @@ def update_package_json():
         json.dump(package_json, f, indent=2)
 
 def get_project_info(PROJECT_NAME):
-    console.print(Panel(f"[bold cyan]プロジェクト '{PROJECT_NAME}' の情報[/bold cyan]"))
+    emit(MESSAGE, level='banner', text=f"プロジェクト '{PROJECT_NAME}' の情報")
     
     project_id = PROJECT_NAME
     vercel_project_name = PROJECT_NAME
     
     return project_id, vercel_project_name
 
-def setup_supabase(project_id):
+async def setup_supabase(project_id):
     global supabase_url, supabase_anon_key
     
     if not supabase_url or not supabase_anon_key:
-        console.print(Panel(f"[bold cyan]Supabaseプロジェクト '{project_id}' の情報を入力してください[/bold cyan]"))
+        emit(MESSAGE, level='banner', text=f"Supabaseプロジェクト '{project_id}' の情報を入力してください")
         console.print("\n[bold cyan]Google認証の設定手順:[/bold cyan]")
         console.print("[cyan]1. Google Cloud Console (https://console.cloud.google.com/) にアクセスし、ログインします。[/cyan]")
         console.print("[cyan]2. 新しいプロジェクトを作成します。[/cyan]")
@@ -297,13 +468,13 @@ def setup_supabase(project_id):
         console.print("\n[bold cyan]上記の手順を完了してから、以下の情報を入力してください。\n[/bold cyan]")
 
         while True:
-            supabase_url = input(f"Supabase URL を入力してください (例: https://{project_id}.supabase.co): ")
+            supabase_url = await ainput(f"Supabase URL を入力してください (例: https://{project_id}.supabase.co): ")
             if supabase_url.startswith("https://") and supabase_url.endswith(".supabase.co"):
                 break
             console.print("[bold red]無効なSupabase URLです。正しいURLを入力してください。[/bold red]")
 
         while True:
-            supabase_anon_key = input("Supabase 匿名キー (anon key) を入力してください: ")
+            supabase_anon_key = await ainput("Supabase 匿名キー (anon key) を入力してください: ")
             if supabase_anon_key.startswith("eyJ"):
                 break
             console.print("[bold red]無効な匿名キーです。正しいキーを入力してください。[/bold red]")
@@ -324,54 +495,124 @@ def setup_supabase(project_id):
 
     return supabase_url, supabase_anon_key, callback_url
 
-def print_loading_animation(message, duration):
-    with Progress() as progress:
-        task = progress.add_task(f"[cyan]{message}", total=100)
-        while not progress.finished:
-            progress.update(task, advance=1)
-            time.sleep(duration / 100)
+def install_dependencies():
+    run_command("npm install", step="install", description="依存関係をインストールしています...")
+    return {}
+
+def install_inputs(checkpoint):
+    return fingerprint(checkpoint.fingerprint_of('package_json'), os.path.isdir('node_modules'))
+
+def typecheck_inputs(checkpoint):
+    return fingerprint(checkpoint.fingerprint_of('install'), tree_hash('app'), file_hash('tsconfig.json'))
+
+def type_check():
+    type_check_result = run_command("npx tsc --noEmit", step="typecheck", description="TypeScriptの型チェックを実行しています...")
+    if type_check_result.returncode != 0:
+        emit(MESSAGE, level='error', text="型チェックに失敗しました。エラーを確認してください:")
+        console.print(type_check_result.stderr)
+        return None
+    return {}
+
+def build_project():
+    build_result = run_command("npm run build", step="build", description="プロジェクトをビルドしています...")
+    if build_result.returncode != 0:
+        emit(MESSAGE, level='error', text="ビルドに失敗しました。エラーを確認してください:")
+        console.print(build_result.stderr)
+        return None
+    return {}
+
+def push_to_vercel(supabase_url, supabase_anon_key, vercel_project_name):
+    run_command("npm install vercel", step="vercel-install", description="Vercel CLIをインストールしています...")
+
+    deploy_command = f"vercel --name {vercel_project_name} --confirm"
+    deploy_command += f" --build-env NEXT_PUBLIC_SUPABASE_URL={supabase_url}"
+    deploy_command += f" --build-env NEXT_PUBLIC_SUPABASE_ANON_KEY={supabase_anon_key}"
+
+    result = run_command(deploy_command, step="deploy", description="Vercelにデプロイしています...")
 
-def deploy_to_vercel(supabase_url, supabase_anon_key, vercel_project_name):
-    console.print(Panel("[bold green]Vercelにデプロイしています...[/bold green]"))
+    # URLは出力の流れの中で検出済み。見つからない場合は従来どおり最終行を使う
+    deploy_url = result.deploy_url or (result.tail[-1].strip() if result.tail else None)
+    return {'deploy_url': deploy_url} if deploy_url else None
+
+def deploy_to_vercel(supabase_url, supabase_anon_key, vercel_project_name, checkpoint=None, load_test=None, targets=None, aliases=None):
+    # targets を指定した場合はデプロイマトリクスとして、ターゲットごとのURLと結果の辞書を返す
+    emit(MESSAGE, level='banner', text="Vercelにデプロイしています...")
+    checkpoint = checkpoint or Checkpoint()
+    prebuilt = targets is not None
+    env_values = {
+        'NEXT_PUBLIC_SUPABASE_URL': supabase_url,
+        'NEXT_PUBLIC_SUPABASE_ANON_KEY': supabase_anon_key,
+    }
     try:
-        os.environ['NEXT_PUBLIC_SUPABASE_URL'] = supabase_url
-        os.environ['NEXT_PUBLIC_SUPABASE_ANON_KEY'] = supabase_anon_key
-
-        console.print("[cyan]TypeScriptの型チェックを実行しています...[/cyan]")
-        print_loading_animation("", 5)
-        type_check_result = run_command("npx tsc --noEmit")
-        if type_check_result.returncode != 0:
-            console.print("[bold red]型チェックに失敗しました。エラーを確認してください:[/bold red]")
-            console.print(type_check_result.stderr)
-            return None
+        os.environ.update(env_values)
 
-        console.print("[cyan]プロジェクトをビルドしています...[/cyan]")
-        print_loading_animation("", 20)
-        build_result = run_command("npm run build")
-        if build_result.returncode != 0:
-            console.print("[bold red]ビルドに失敗しました。エラーを確認してください:[/bold red]")
-            console.print(build_result.stderr)
+        # 各フェーズの入力には直前のフェーズのフィンガープリントを含め、上流の変更が下流に伝わるようにする
+        # 事前準備で失敗したインストールと型チェックはここで再実行される（完了済みならスキップ）
+        if checkpoint.run('install', lambda: install_inputs(checkpoint), install_dependencies) is None:
+            return None
+        if checkpoint.run('typecheck', lambda: typecheck_inputs(checkpoint), type_check) is None:
             return None
 
-        console.print("[cyan]Vercel CLIをインストールしています...[/cyan]")
-        print_loading_animation("", 5)
-        run_command("npm install vercel")
+        def build_inputs():
+            inputs = [checkpoint.fingerprint_of('typecheck'), env_values, file_hash('next.config.js')]
+            if prebuilt:
+                inputs.append('vercel-build')
+            return fingerprint(*inputs)
+
+        if checkpoint.run(
+            'build',
+            build_inputs,
+            (lambda: build_prebuilt(vercel_project_name)) if prebuilt else build_project,
+        ) is None:
+            return None
 
-        deploy_command = f"vercel --name {vercel_project_name} --confirm"
-        deploy_command += f" --build-env NEXT_PUBLIC_SUPABASE_URL={supabase_url}"
-        deploy_command += f" --build-env NEXT_PUBLIC_SUPABASE_ANON_KEY={supabase_anon_key}"
+        # デプロイ前の負荷テスト（有効な場合のみ）
+        if load_test is not None and checkpoint.run(
+            'loadtest',
+            lambda: fingerprint(checkpoint.fingerprint_of('build'), load_test),
+            lambda: {} if run_load_test_gate(wait_for_server, **load_test) else None,
+        ) is None:
+            emit(MESSAGE, level='error', text="負荷テストの結果が基準を満たさないため、デプロイを中止しました。")
+            return None
 
-        console.print("[cyan]Vercelにデプロイしています...[/cyan]")
-        print_loading_animation("", 180)
-        result = run_command(deploy_command)
-        
-        deploy_url = result.stdout.strip().split('\n')[-1]
-        return deploy_url
-    except subprocess.CalledProcessError as e:
-        console.print(f"[bold red]Vercelへのデプロイ中にエラーが発生しました: {e}[/bold red]")
+        if prebuilt:
+            # 成功したターゲットはフェーズの完了前でも記録し、再実行では失敗したターゲットだけをデプロイする
+            partial_inputs = fingerprint(checkpoint.fingerprint_of('build'), vercel_project_name)
+            matrix = {}
+
+            def push():
+                deployed = checkpoint.partial('deploy', partial_inputs).get('deployed', {})
+                matrix.update(push_targets(targets, aliases, deployed))
+                deployed.update({result['target']: result for result in matrix['results'] if not result['error']})
+                checkpoint.save_partial('deploy', partial_inputs, deployed=deployed)
+                return None if matrix['failed'] else matrix
+
+            return checkpoint.run(
+                'deploy',
+                lambda: fingerprint(checkpoint.fingerprint_of('build'), vercel_project_name, targets, aliases),
+                push,
+            ) or matrix or None
+
+        outputs = checkpoint.run(
+            'deploy',
+            lambda: fingerprint(checkpoint.fingerprint_of('build'), vercel_project_name),
+            lambda: push_to_vercel(supabase_url, supabase_anon_key, vercel_project_name),
+        )
+        return outputs.get('deploy_url') if outputs else None
+    except subprocess.SubprocessError as e:
+        emit(MESSAGE, level='error', text=f"Vercelへのデプロイ中にエラーが発生しました: {e}")
+        if e.output:
+            console.print(e.output, markup=False)
+        emit(WARNING, message=f"ログ全体: {getattr(e, 'log_path', '')}")
+        return None
+    except LoadTestError as e:
+        emit(MESSAGE, level='error', text=f"負荷テスト中にエラーが発生しました: {e}")
         return None
 
 def update_supabase_settings(project_id, api_key, site_url, callback_url):
+    # callback_url はURLのリストでもよい（デプロイマトリクスでは全ターゲットのURLをまとめて登録する）
+    callback_urls = [callback_url] if isinstance(callback_url, str) else list(callback_url)
+
     # Supabase管理APIのエンドポイント
     api_url = f"https://api.supabase.com/v1/projects/{project_id}/config/auth"
 
@@ -384,16 +625,18 @@ def update_supabase_settings(project_id, api_key, site_url, callback_url):
     # 更新するデータ
     data = {
         "site_url": site_url,
-        "additional_redirect_urls": [callback_url]
+        "additional_redirect_urls": callback_urls
     }
 
     try:
         # PATCHリクエストを送信
         response = requests.patch(api_url, headers=headers, json=data)
         response.raise_for_status()
-        console.print("[green]Supabaseの設定が正常に更新されました。[/green]")
+        emit(MESSAGE, level='success', text="Supabaseの設定が正常に更新されました。")
+        return True
     except requests.exceptions.RequestException as e:
-        console.print(f"[bold red]Supabaseの設定更新中にエラーが発生��ました: {e}[/bold red]")
+        emit(MESSAGE, level='error', text=f"Supabaseの設定更新中にエラーが発生��ました: {e}")
+        return False
 
 def generate_file_tree(startpath):
     tree = []
@@ -469,7 +712,7 @@ Check out our [Next.js deployment documentation](https://nextjs.org/docs/deploym
     create_file('README.md', readme_content.strip())
 
 def print_setup_complete_message(PROJECT_NAME, supabase_url, supabase_anon_key, deploy_url):
-    console.print(Panel("[bold green]プロジェクトのセットアップが完了しました。[/bold green]"))
+    emit(MESSAGE, level='banner', text="プロジェクトのセットアップが完了しました。")
     if supabase_url and supabase_anon_key:
         console.print("[cyan]Supabaseの設定が完了し、.env.localファイルに保存されました。[/cyan]")
     else:
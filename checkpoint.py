@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+from events import emit, STEP_FINISHED
+
+# パイプラインのフェーズ（実行順）
+PHASES = ['generate', 'package_json', 'install', 'typecheck', 'build', 'loadtest', 'deploy', 'supabase_settings']
+
+STATE_FILE = os.path.join('.zoltraak', 'state.json')
+
+
+def fingerprint(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def tree_hash(directory):
+    # ディレクトリ以下のファイルの内容をパス順にまとめてハッシュする
+    entries = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d not in ('node_modules', '.next', '__pycache__'))
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            entries.append((os.path.relpath(path, directory), file_hash(path)))
+    return fingerprint(entries)
+
+
+class Checkpoint:
+    # 各フェーズの完了時に入力のフィンガープリントと出力を状態ファイルへ保存する
+    def __init__(self, path=STATE_FILE, restart_from=None):
+        if restart_from is not None and restart_from not in PHASES:
+            raise ValueError(f"不明なフェーズです: {restart_from}（{', '.join(PHASES)} のいずれか）")
+        self.path = path
+        self.restart_index = PHASES.index(restart_from) if restart_from else len(PHASES)
+        self.state = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'phases': {}}
+        state.setdefault('phases', {})
+        return state
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 途中で中断されても壊れないよう一時ファイルに書いてから置き換える
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, phase, inputs):
+        if PHASES.index(phase) >= self.restart_index:
+            return False
+        entry = self.state['phases'].get(phase)
+        return bool(entry) and entry.get('fingerprint') == inputs
+
+    def fingerprint_of(self, phase):
+        return self.state['phases'].get(phase, {}).get('fingerprint')
+
+    def outputs(self, phase):
+        return self.state['phases'].get(phase, {}).get('outputs', {})
+
+    def complete(self, phase, inputs, **outputs):
+        self.state['phases'][phase] = {'fingerprint': inputs, 'outputs': outputs}
+        self.state.get('partial', {}).pop(phase, None)
+        self.save()
+
+    def partial(self, phase, inputs):
+        # 途中まで完了したフェーズの出力（入力が前回と同じで、--from でやり直す対象でない場合のみ）
+        if PHASES.index(phase) >= self.restart_index:
+            return {}
+        entry = self.state.get('partial', {}).get(phase)
+        if not entry or entry.get('fingerprint') != inputs:
+            return {}
+        return entry.get('outputs', {})
+
+    def save_partial(self, phase, inputs, **outputs):
+        self.state.setdefault('partial', {})[phase] = {'fingerprint': inputs, 'outputs': outputs}
+        self.save()
+
+    def run(self, phase, inputs, func):
+        # inputs はフィンガープリントを返す関数。入力が前回と同じならスキップして保存済みの出力を返す
+        # func は出力の辞書を返し、失敗時は None を返す
+        if self.is_done(phase, inputs()):
+            emit(STEP_FINISHED, step=phase, skipped=True)
+            return self.outputs(phase)
+        # 途中で失敗しても次回このフェーズをやり直すよう、先に完了記録を消しておく
+        self.state['phases'].pop(phase, None)
+        self.save()
+        outputs = func()
+        if outputs is None:
+            return None
+        # フェーズ自身が入力を書き換える場合（package.json など）に備えて完了後の値を記録する
+        self.complete(phase, inputs(), **outputs)
+        return outputs
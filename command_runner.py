@@ -0,0 +1,324 @@
+import os
+import re
+import time
+import atexit
+import asyncio
+import signal
+import logging
+import threading
+import subprocess
+from functools import lru_cache
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from events import bus, emit, STEP_STARTED, STEP_FINISHED, SUBPROCESS_LINE, WARNING
+
+# ステップごとのログはプロジェクト内の .zoltraak/logs/<step>.log にローテーションしながら保存する
+LOG_DIR = os.path.join('.zoltraak', 'logs')
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# 失敗時の報告用にメモリに残すのは末尾の数行だけ
+TAIL_LINES = 200
+MAX_LINE_LENGTH = 2000
+
+DEPLOY_URL_PATTERN = re.compile(r'https://[A-Za-z0-9.-]+\.vercel\.app\b[^\s]*')
+
+# ステップごとの制限時間（秒）。ここにないステップは DEFAULT_TIMEOUT を使う
+DEFAULT_TIMEOUT = 1800
+STEP_TIMEOUTS = {
+    'create-next-app': 600,
+    'install-deps': 900,
+    'typecheck': 600,
+    'build': 1200,
+    'vercel-install': 600,
+    'deploy': 900,
+    'vercel-link': 300,
+    'vercel-pull': 300,
+    'vercel-build': 1200,
+}
+KILL_GRACE_SECONDS = 5
+
+# Nodeのジョブとして同時実行数を制限するコマンド
+NODE_COMMANDS = {'npm', 'npx', 'node', 'next', 'vercel', 'yarn', 'pnpm'}
+
+_active_processes = set()
+_active_logs = set()
+_active_lock = threading.Lock()
+_cancelled = threading.Event()
+_node_slots = None
+_node_slots_lock = threading.Lock()
+
+
+class CommandResult:
+    def __init__(self, args, returncode, tail, log_path, deploy_url=None):
+        self.args = args
+        self.returncode = returncode
+        self.tail = tail
+        self.log_path = log_path
+        self.deploy_url = deploy_url
+
+    # subprocess.CompletedProcess と同じ属性名で末尾の出力を参照できるようにする
+    @property
+    def stdout(self):
+        return '\n'.join(self.tail)
+
+    @property
+    def stderr(self):
+        return self.stdout
+
+
+def available_cpus():
+    # CPUアフィニティとcgroupのCPUクォータの小さい方を利用可能なコア数とする
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        # cgroup v2
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            limit, period = f.read().split()
+        if limit != 'max':
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                limit = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+@lru_cache(maxsize=None)
+def _configured_node_jobs(value):
+    # 値ごとに1回だけ解釈する（不正な値の警告を繰り返さない）
+    try:
+        return max(1, int(value))
+    except ValueError:
+        emit(WARNING, message=f"ZOLTRAAK_MAX_NODE_JOBS の値が不正です: {value!r}。コア数から決めた既定値を使います。")
+        return None
+
+
+def max_node_jobs():
+    # 環境変数で上書きできる。デフォルトは1ジョブあたり2コアを割り当てる
+    configured = os.getenv('ZOLTRAAK_MAX_NODE_JOBS')
+    if configured:
+        jobs = _configured_node_jobs(configured)
+        if jobs:
+            return jobs
+    return max(1, available_cpus() // 2)
+
+
+def node_cpus():
+    # 1つのNodeジョブに割り当てるコア数
+    return max(1, available_cpus() // max_node_jobs())
+
+
+def node_slots():
+    global _node_slots
+    with _node_slots_lock:
+        if _node_slots is None:
+            _node_slots = threading.BoundedSemaphore(max_node_jobs())
+        return _node_slots
+
+
+def is_node_command(command):
+    if isinstance(command, (list, tuple)):
+        command = ' '.join(command)
+    words = command.split()
+    return bool(words) and os.path.basename(words[0]) in NODE_COMMANDS
+
+
+def node_env(env=None):
+    # 同時に動くNodeジョブ全体でコア数を超えないようにワーカースレッド数を抑える。
+    # UV_THREADPOOL_SIZE は libuv のスレッドプールだけなので、next build のワーカー数は
+    # 生成した next.config.js が ZOLTRAAK_NODE_CPUS を experimental.cpus として読む
+    env = dict(os.environ if env is None else env)
+    cpus = str(node_cpus())
+    env.setdefault('UV_THREADPOOL_SIZE', cpus)
+    env.setdefault('ZOLTRAAK_NODE_CPUS', cpus)
+    return env
+
+
+def kill_process_tree(process, grace=KILL_GRACE_SECONDS):
+    # プロセスグループ全体にSIGTERMを送り、終了しなければSIGKILLする
+    try:
+        pgid = os.getpgid(process.pid)
+    except ProcessLookupError:
+        return
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def kill_process_tree_async(process, grace=KILL_GRACE_SECONDS):
+    # asyncio のサブプロセス向け（start_new_session=True で起動したもの）
+    try:
+        pgid = os.getpgid(process.pid)
+        os.killpg(pgid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        pass
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def cancel_all():
+    # 実行中のコマンドを終了し、以降のコマンドも起動しない（別スレッドで続くフェーズを止める）
+    _cancelled.set()
+    with _active_lock:
+        processes = list(_active_processes)
+    for process in processes:
+        kill_process_tree(process, grace=1)
+
+
+atexit.register(cancel_all)
+
+
+def step_name(command):
+    if isinstance(command, (list, tuple)):
+        command = ' '.join(command)
+    words = re.findall(r'[A-Za-z0-9]+', command)[:3]
+    return '-'.join(words).lower() or 'command'
+
+
+def open_step_log(step, log_dir=LOG_DIR):
+    os.makedirs(log_dir, exist_ok=True)
+    # 同じステップ名のコマンドが同時に動く場合は <step>-2.log のように別のファイルへ書き、
+    # 1つのファイルを複数のハンドラでローテーションしないようにする
+    with _active_lock:
+        log_path = os.path.join(log_dir, f'{step}.log')
+        number = 1
+        while os.path.abspath(log_path) in _active_logs:
+            number += 1
+            log_path = os.path.join(log_dir, f'{step}-{number}.log')
+        _active_logs.add(os.path.abspath(log_path))
+    try:
+        handler = RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    except BaseException:
+        close_step_log(None, None, log_path)
+        raise
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    # logging.getLogger のロガーは同じ名前で共有されるため、呼び出しごとに独立したロガーを作る
+    logger = logging.Logger(f'zoltraak.step.{step}', logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger, handler, log_path
+
+
+def close_step_log(logger, handler, log_path):
+    if handler is not None:
+        logger.removeHandler(handler)
+        handler.close()
+    with _active_lock:
+        _active_logs.discard(os.path.abspath(log_path))
+
+
+def run_command(command, shell=True, check=True, step=None, timeout=None, tail_lines=TAIL_LINES, log_dir=LOG_DIR, env=None, description=None, node_job=None):
+    step = step or step_name(command)
+    if _cancelled.is_set():
+        raise subprocess.CalledProcessError(-signal.SIGINT, command, output="中断されたため実行しませんでした。")
+    if timeout is None:
+        timeout = STEP_TIMEOUTS.get(step, DEFAULT_TIMEOUT)
+    # node_job=False はアップロード待ちなどCPUをほとんど使わないNodeコマンドを同時実行数の制限から外す
+    if node_job is None:
+        node_job = is_node_command(command)
+    if node_job:
+        env = node_env(env)
+        node_slots().acquire()
+    try:
+        logger, handler, log_path = open_step_log(step, log_dir)
+    except BaseException:
+        # ログを開けない場合も枠を返さないと、以降のNodeコマンドが待ち続ける
+        if node_job:
+            node_slots().release()
+        raise
+    tail = deque(maxlen=tail_lines)
+    deploy_url = None
+    timed_out = threading.Event()
+    process = None
+    timer = None
+    returncode = None
+    emit(STEP_STARTED, step=step, command=command, description=description)
+    started = time.monotonic()
+    try:
+        # 独自のプロセスグループで起動し、タイムアウトや中断時に子孫プロセスごと終了できるようにする
+        # stderr を stdout にまとめ、1行ずつディスクへ流す（全出力をメモリに保持しない）
+        process = subprocess.Popen(
+            command, shell=shell, text=True, errors='replace', bufsize=1, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+        with _active_lock:
+            _active_processes.add(process)
+        if timeout:
+            def on_timeout():
+                timed_out.set()
+                kill_process_tree(process)
+            timer = threading.Timer(timeout, on_timeout)
+            timer.daemon = True
+            timer.start()
+        # 改行のない出力（圧縮されたダンプなど）もメモリに溜めないよう、MAX_LINE_LENGTH 文字ごとに区切って読む。
+        # テキストモードでは \r も改行として扱われるため、進捗バーの更新も1行ずつになる
+        with process.stdout:
+            for line in iter(lambda: process.stdout.readline(MAX_LINE_LENGTH), ''):
+                line = line.rstrip('\n')
+                logger.info(line)
+                if bus.wants(SUBPROCESS_LINE):
+                    emit(SUBPROCESS_LINE, step=step, line=line)
+                tail.append(line)
+                match = DEPLOY_URL_PATTERN.search(line)
+                if match:
+                    deploy_url = match.group(0)
+        returncode = process.wait()
+    except BaseException:
+        # Ctrl+C などで中断された場合も子孫のNodeプロセスを残さない
+        if process is not None:
+            kill_process_tree(process)
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if timed_out.is_set():
+            logger.warning(f"タイムアウト: {timeout}秒")
+        if process is not None:
+            with _active_lock:
+                _active_processes.discard(process)
+        if node_job:
+            node_slots().release()
+        close_step_log(logger, handler, log_path)
+        emit(STEP_FINISHED, step=step, returncode=-1 if timed_out.is_set() else returncode,
+             duration=time.monotonic() - started, log_path=log_path)
+
+    if timed_out.is_set():
+        error = subprocess.TimeoutExpired(command, timeout, output='\n'.join(tail))
+        error.log_path = log_path
+        raise error
+
+    result = CommandResult(command, returncode, tail, log_path, deploy_url)
+    if check and returncode != 0:
+        error = subprocess.CalledProcessError(returncode, command, output=result.stdout)
+        error.log_path = log_path
+        raise error
+    return result
@@ -1,87 +1,224 @@
 import os
+import re
+import json
+import argparse
 import subprocess
 
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages.json')
+
+# 共有テンプレート（ページ・レイアウト・コンポーネントはすべてここから描画する）
+ROOT_LAYOUT_TEMPLATE = """{imports}
+export default function RootLayout({{ children }}) {{
+  return (
+    <html lang="{lang}">
+      <body>{before}{{children}}{after}</body>
+    </html>
+  )
+}}
+"""
+
+LAYOUT_TEMPLATE = """{imports}
+export default function {name}({{ children }}) {{
+  return (
+    <div className="{class_name}">
+      {before}{{children}}{after}
+    </div>
+  )
+}}
+"""
+
+# tsconfig の paths（@/）に頼らず、生成先に設定ファイルがなくても解決できる相対パスで参照する
+LAYOUT_REEXPORT_TEMPLATE = "export {{ default }} from '{prefix}components/layouts/{name}'\n"
+
+PAGE_TEMPLATE = "export default function {component}() {{ return <{tag}>{title}</{tag}> }}\n"
+
+DYNAMIC_PAGE_TEMPLATE = "export default function {component}({{ params }}) {{ return <{tag}>{title}</{tag}> }}\n"
+
+COMPONENT_TEMPLATE = "export default function {name}() {{ return <{tag}>{text}</{tag}> }}\n"
+
+DYNAMIC_SEGMENT = re.compile(r'^\[(?:\.\.\.)?([A-Za-z_][A-Za-z0-9_]*)\]$')
+
+
 def create_file(path, content):
     with open(path, 'w') as f:
         f.write(content)
 
-def create_nextjs_structure():
-    base_dir = "my-nextjs-app"
-    os.makedirs(base_dir, exist_ok=True)
-    os.chdir(base_dir)
-
-    # Create directory structure
-    directories = [
-        "app",
-        "app/components",
-        "app/dashboard",
-        "app/dashboard/overview",
-        "app/dashboard/analytics",
-        "app/profile",
-        "app/profile/[username]",
-        "app/settings",
-        "app/settings/account",
-        "app/settings/notifications",
-        "app/api",
-        "public"
-    ]
-
-    for directory in directories:
+
+def load_route_manifest(path):
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("YAMLマニフェストを読み込むには PyYAML が必要です: pip install pyyaml")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _component_name(segments):
+    words = []
+    for segment in segments:
+        match = DYNAMIC_SEGMENT.match(segment)
+        words.append(match.group(1) if match else segment)
+    name = ''.join(w[:1].upper() + w[1:] for w in re.split(r'[^0-9A-Za-z]+', ' '.join(words)) if w)
+    if not name or name[0].isdigit():
+        name = 'Page' + name
+    return name
+
+
+def _component_imports(names, prefix='./'):
+    # prefix は描画するファイルのディレクトリから app/ への相対パス
+    return ''.join(f"import {name} from '{prefix}components/{name}'\n" for name in names)
+
+
+def _wrap_components(spec):
+    before = ''.join(f'<{name} />' for name in spec.get('before', []))
+    after = ''.join(f'<{name} />' for name in spec.get('after', []))
+    return before, after
+
+
+def iter_routes(routes):
+    # 再帰を使わずにルートツリーを展開する（深いツリーでもスタックを消費しない）
+    stack = [((), (), route) for route in reversed(routes or [])]
+    while stack:
+        parent, params, route = stack.pop()
+        segments = parent + (route['segment'],)
+        match = DYNAMIC_SEGMENT.match(route['segment'])
+        if match:
+            params = params + (match.group(1),)
+        yield segments, params, route
+        for child in reversed(route.get('children', [])):
+            stack.append((segments, params, child))
+
+
+def render_page(segments, params, route):
+    title = route.get('title', segments[-1])
+    component = route.get('component') or _component_name(segments)
+    tag = route.get('tag', 'h1')
+    if params:
+        # タイトル中の {param} を params.<param> の参照に置き換える
+        for param in params:
+            title = title.replace('{' + param + '}', '{params.' + param + '}')
+        return DYNAMIC_PAGE_TEMPLATE.format(component=component, tag=tag, title=title)
+    return PAGE_TEMPLATE.format(component=component, tag=tag, title=title)
+
+
+def render_layout(name, spec):
+    names = spec.get('before', []) + spec.get('after', [])
+    before, after = _wrap_components(spec)
+    return LAYOUT_TEMPLATE.format(
+        imports=_component_imports(names, '../../'),
+        name=name,
+        class_name=spec.get('className', ''),
+        before=before,
+        after=after,
+    ).lstrip()
+
+
+def render_nextjs_files(manifest, project_name):
+    ext = manifest.get('extension', 'tsx')
+    files = {}
+
+    # ルートレイアウト
+    root = manifest.get('rootLayout', {})
+    root_before, root_after = _wrap_components(root)
+    files[f'app/layout.{ext}'] = ROOT_LAYOUT_TEMPLATE.format(
+        imports=_component_imports(root.get('before', []) + root.get('after', [])),
+        lang=root.get('lang', 'en'),
+        before=root_before,
+        after=root_after,
+    ).lstrip()
+
+    # 共有コンポーネント
+    for name, spec in manifest.get('components', {}).items():
+        if isinstance(spec, str):
+            spec = {'text': spec}
+        files[f'app/components/{name}.{ext}'] = COMPONENT_TEMPLATE.format(
+            name=name, tag=spec.get('tag', 'div'), text=spec.get('text', name))
+
+    # レイアウトは定義が同一のものを1ファイルにまとめ、各ルートからは最初のファイルを再エクスポートする
+    # （描画結果にはコンポーネント名が含まれるため、定義そのものをキーにする）
+    layout_specs = manifest.get('layouts', {})
+    layout_files = {}
+    layout_keys = {}
+    layout_exports = {}
+    for layout_name, spec in layout_specs.items():
+        component = _component_name([layout_name]) + 'Layout'
+        key = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+        # my-layout と my_layout のように別名が同じコンポーネント名になり、定義が異なる場合は上書きしてしまう
+        other = layout_keys.setdefault(component, (layout_name, key))
+        if other[1] != key:
+            raise ValueError(f"レイアウト '{other[0]}' と '{layout_name}' のコンポーネント名 '{component}' が重複しています。")
+        shared = layout_files.setdefault(key, component)
+        if shared == component:
+            files[f'app/components/layouts/{component}.{ext}'] = render_layout(component, spec)
+        layout_exports[layout_name] = shared
+
+    # Next.js は同じ階層に名前の異なる動的セグメントを置けない
+    dynamic_children = {}
+    for segments, params, route in iter_routes(manifest.get('routes')):
+        route_dir = 'app/' + '/'.join(segments)
+        if DYNAMIC_SEGMENT.match(segments[-1]):
+            sibling = dynamic_children.setdefault(segments[:-1], segments[-1])
+            if sibling != segments[-1]:
+                raise ValueError(f"'{route_dir}' と同じ階層に別名の動的セグメント '{sibling}' があります。")
+        if route.get('page', True):
+            files[f'{route_dir}/page.{ext}'] = render_page(segments, params, route)
+        layout_name = route.get('layout')
+        if layout_name:
+            if layout_name not in layout_exports:
+                raise ValueError(f"未定義のレイアウト '{layout_name}' が '{route_dir}' で参照されています。")
+            files[f'{route_dir}/layout.{ext}'] = LAYOUT_REEXPORT_TEMPLATE.format(
+                prefix='../' * len(segments), name=layout_exports[layout_name])
+
+    # 静的ファイル（辞書はJSONとして書き出す）
+    for path, content in manifest.get('files', {}).items():
+        if isinstance(content, (dict, list)):
+            content = json.dumps(content, indent=2, ensure_ascii=False) + '\n'
+        files[path] = content.replace('{project_name}', project_name)
+
+    for directory in manifest.get('directories', []):
+        files.setdefault(f'{directory}/.gitkeep', '')
+
+    return files
+
+
+def write_files(base_dir, files):
+    # ディレクトリ作成を一括で行ってから全ファイルを書き出す
+    directories = {os.path.dirname(os.path.join(base_dir, path)) for path in files}
+    for directory in sorted(directories):
         os.makedirs(directory, exist_ok=True)
+    for path, content in files.items():
+        create_file(os.path.join(base_dir, path), content)
+
+
+def create_nextjs_structure(manifest_path=DEFAULT_MANIFEST, base_dir="my-nextjs-app", skip_setup=False, manifest=None):
+    if manifest is None:
+        manifest = load_route_manifest(manifest_path)
+    project_name = os.path.basename(os.path.abspath(base_dir))
+
+    files = render_nextjs_files(manifest, project_name)
+    write_files(base_dir, files)
+
+    if not skip_setup:
+        # Initialize git repository
+        subprocess.run(["git", "init"], cwd=base_dir)
+
+        # Install dependencies
+        subprocess.run(["npm", "install"], cwd=base_dir)
+
+    print(f"Next.js App Router structure created successfully! ({len(files)} files)")
+    return files
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ルートマニフェストからNext.js App Routerの構成を生成します")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST, help="ルートマニフェスト (JSON/YAML)")
+    parser.add_argument('--out', default="my-nextjs-app", help="出力先ディレクトリ")
+    parser.add_argument('--skip-setup', action='store_true', help="git init / npm install を実行しない")
+    return parser.parse_args(argv)
 
-    # Create files with basic content
-    files = {
-        "app/layout.tsx": """
-export default function RootLayout({ children }) {
-  return (
-    <html lang="en">
-      <body>{children}</body>
-    </html>
-  )
-}
-""",
-        "app/page.tsx": "export default function Home() { return <h1>Welcome to Next.js!</h1> }",
-        "app/globals.css": "body { font-family: sans-serif; }",
-        "app/components/Sidebar.tsx": "export default function Sidebar() { return <nav>Sidebar</nav> }",
-        "app/components/MainContent.tsx": "export default function MainContent() { return <main>Main Content</main> }",
-        "app/dashboard/page.tsx": "export default function Dashboard() { return <h1>Dashboard</h1> }",
-        "app/dashboard/overview/page.tsx": "export default function Overview() { return <h1>Dashboard Overview</h1> }",
-        "app/dashboard/analytics/page.tsx": "export default function Analytics() { return <h1>Dashboard Analytics</h1> }",
-        "app/profile/page.tsx": "export default function Profile() { return <h1>Profile</h1> }",
-        "app/profile/[username]/page.tsx": "export default function UserProfile({ params }) { return <h1>Profile of {params.username}</h1> }",
-        "app/settings/page.tsx": "export default function Settings() { return <h1>Settings</h1> }",
-        "app/settings/account/page.tsx": "export default function AccountSettings() { return <h1>Account Settings</h1> }",
-        "app/settings/notifications/page.tsx": "export default function NotificationSettings() { return <h1>Notification Settings</h1> }",
-        "package.json": """{
-  "name": "my-nextjs-app",
-  "version": "0.1.0",
-  "private": true,
-  "scripts": {
-    "dev": "next dev",
-    "build": "next build",
-    "start": "next start",
-    "lint": "next lint"
-  },
-  "dependencies": {
-    "next": "13.4.19",
-    "react": "18.2.0",
-    "react-dom": "18.2.0"
-  }
-}
-""",
-        "next.config.js": "/** @type {import('next').NextConfig} */\nconst nextConfig = {}\nmodule.exports = nextConfig"
-    }
-
-    for file_path, content in files.items():
-        create_file(file_path, content)
-
-    # Initialize git repository
-    subprocess.run(["git", "init"])
-
-    # Install dependencies
-    subprocess.run(["npm", "install"])
-
-    print("Next.js App Router structure created successfully!")
 
 if __name__ == "__main__":
-    create_nextjs_structure()
\ No newline at end of file
+    args = parse_args()
+    create_nextjs_structure(args.manifest, args.out, skip_setup=args.skip_setup)
@@ -14,13 +14,63 @@ from rich import print as rprint
 import requests
 from dotenv import load_dotenv
 import asyncio
+import argparse
+from template_registry import render_template, output_path
+from events import emit, FILE_WRITTEN, MESSAGE, bus, ConsoleSink
+from archive_output import write_archive, open_output, detect_format, check_format, FORMATS
+from fonts import FONT_OUTPUT, vendor_font, resolve_local_font
+
+
+# プロジェクトに書き出すテンプレート（templates/ 以下の相対パス）
+PROJECT_TEMPLATES = [
+    'next.config.js',
+    'app/layout.tsx',
+    'app/page.tsx',
+    'app/providers.tsx',
+    'app/components/TaskList.tsx',
+    'app/components/LoginButton.tsx',
+    'app/store/index.ts',
+    'app/store/tasksSlice.ts',
+    'app/utils/supabase.ts',
+    'app/auth/callback/route.ts',
+]
+
+# 生成オプションを有効にしたときだけ追加で書き出すテンプレート
+FEATURE_TEMPLATES = {
+    # タスクを localStorage に保存するミドルウェア
+    'persist': ['app/store/persist.ts'],
+}
 
-console = Console()
-
-def create_project_files(PROJECT_NAME, USE_TYPESCRIPT):
-    FILE_EXT = 'ts' if USE_TYPESCRIPT else 'js'
-    TSX_EXT = 'tsx' if USE_TYPESCRIPT else 'jsx'
-
+def project_templates(features=()):
+    names = list(PROJECT_TEMPLATES)
+    for feature in sorted(features):
+        names.extend(FEATURE_TEMPLATES.get(feature, []))
+    return names
+
+def render_project_file(name, USE_TYPESCRIPT, features=()):
+    return output_path(name, USE_TYPESCRIPT), render_template(name, USE_TYPESCRIPT, features)
+
+def render_project_files(USE_TYPESCRIPT, features=(), font_source=None):
+    files = dict(render_project_file(name, USE_TYPESCRIPT, features) for name in project_templates(features))
+    if 'local_font' in features:
+        # 描画したテンプレートの文字列に含まれる文字だけのフォントを同梱する
+        files[FONT_OUTPUT] = vendor_font(files.values(), font_source)
+    return files
+
+def create_project_archive(PROJECT_NAME, USE_TYPESCRIPT, target, fmt=None, features=(), font_source=None):
+    # 生成したファイルをディスクに書き出さず、そのままアーカイブとして target へ流す
+    fmt = fmt or detect_format(target)
+    check_format(fmt)
+    stream, should_close = open_output(target)
+    try:
+        write_archive(render_project_files(USE_TYPESCRIPT, features, font_source), stream, fmt, prefix=f'{PROJECT_NAME}/')
+    finally:
+        if should_close:
+            stream.close()
+    # 標準出力にアーカイブを書いている場合はメッセージを標準エラーへ出す
+    Console(stderr=True).print(f"[green]{fmt}形式のアーカイブを {target} に出力しました。[/green]")
+
+def create_project_files(PROJECT_NAME, USE_TYPESCRIPT, features=(), font_source=None):
     directories = [
         'app/components', 'app/store', 'app/utils', 'app/types',
         'app/features/auth', 'app/features/tasks'
@@ -28,346 +78,14 @@ def create_project_files(PROJECT_NAME, USE_TYPESCRIPT):
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
 
-    files = {
-        f'app/layout.{TSX_EXT}': """
-import './globals.css'
-import { Inter } from 'next/font/google'
-import { Providers } from './providers'
-
-const inter = Inter({ subsets: ['latin'] })
-
-export const metadata = {
-  title: 'Task Manager',
-  description: 'A simple task manager built with Next.js, Redux, and Supabase',
-}
-
-export default function RootLayout({
-  children,
-}: {
-  children: React.ReactNode
-}) {
-  return (
-    <html lang="en">
-      <body className={inter.className}>
-        <Providers>{children}</Providers>
-      </body>
-    </html>
-  )
-}
-        """,
-        f'app/page.{TSX_EXT}': """
-import TaskList from './components/TaskList'
-import LoginButton from './components/LoginButton'
-
-export default function Home() {
-  return (
-    <main className="flex min-h-screen flex-col items-center justify-center p-24 bg-gradient-to-r from-blue-100 to-purple-100">
-      <div className="bg-white shadow-2xl rounded-lg p-8 max-w-md w-full">
-        <h1 className="text-4xl font-bold text-center mb-8 text-gray-800">タスク管理アプリ</h1>
-        <div className="mb-8 flex justify-center">
-          <LoginButton />
-        </div>
-        <TaskList />
-      </div>
-    </main>
-  )
-}
-        """,
-        f'app/providers.{TSX_EXT}': """
-'use client'
-
-import { Provider } from 'react-redux'
-import { store } from './store'
-import { createBrowserSupabaseClient } from '@supabase/auth-helpers-nextjs'
-import { SessionContextProvider } from '@supabase/auth-helpers-react'
-import { useState } from 'react'
-
-export function Providers({ children }: { children: React.ReactNode }) {
-  const [supabaseClient] = useState(() => createBrowserSupabaseClient())
-
-  return (
-    <SessionContextProvider supabaseClient={supabaseClient}>
-      <Provider store={store}>
-        {children}
-      </Provider>
-    </SessionContextProvider>
-  )
-}
-        """,
-        f'app/components/TaskList.{TSX_EXT}': """
-'use client'
-
-import { useSelector, useDispatch } from 'react-redux'
-import { addTask, toggleTask, removeTask } from '../store/tasksSlice'
-import { useState } from 'react'
-import { RootState, AppDispatch } from '../store'
-import { useSession, useSupabaseClient } from '@supabase/auth-helpers-react'
-import { motion, AnimatePresence } from 'framer-motion'
-
-export default function TaskList() {
-  const tasks = useSelector((state: RootState) => state.tasks)
-  const dispatch = useDispatch<AppDispatch>()
-  const [newTask, setNewTask] = useState('')
-  const session = useSession()
-  const supabase = useSupabaseClient()
-
-  const handleAddTask = () => {
-    if (newTask.trim()) {
-      dispatch(addTask({ title: newTask }))
-      setNewTask('')
-    }
-  }
-
-  if (!session) {
-    return <div className="text-center text-gray-600">タスクを表示・管理するにはログインしてください。</div>
-  }
-
-  return (
-    <div className="w-full max-w-md bg-white shadow-lg rounded-lg p-6">
-      <div className="mb-4">
-        <input
-          type="text"
-          value={newTask}
-          onChange={(e) => setNewTask(e.target.value)}
-          className="shadow appearance-none border rounded w-full py-2 px-3 text-gray-700 leading-tight focus:outline-none focus:shadow-outline"
-          placeholder="新しいタスク"
-        />
-        <button
-          onClick={handleAddTask}
-          className="mt-2 w-full bg-blue-500 hover:bg-blue-700 text-white font-bold py-2 px-4 rounded focus:outline-none focus:shadow-outline transition duration-300 ease-in-out transform hover:scale-105"
-        >
-          タスクを追加
-        </button>
-      </div>
-      <AnimatePresence>
-        {tasks.map((task) => (
-          <motion.div
-            key={task.id}
-            initial={{ opacity: 0, y: -10 }}
-            animate={{ opacity: 1, y: 0 }}
-            exit={{ opacity: 0, y: -10 }}
-            transition={{ duration: 0.3 }}
-            className="mb-2 flex items-center bg-gray-100 p-3 rounded-lg"
-          >
-            <input
-              type="checkbox"
-              checked={task.completed}
-              onChange={() => dispatch(toggleTask(task.id))}
-              className="mr-2 form-checkbox h-5 w-5 text-blue-600"
-            />
-            <span className={`flex-grow ${task.completed ? 'line-through text-gray-500' : 'text-gray-800'}`}>
-              {task.title}
-            </span>
-            <button
-              onClick={() => dispatch(removeTask(task.id))}
-              className="ml-2 bg-red-500 hover:bg-red-700 text-white font-bold py-1 px-2 rounded focus:outline-none focus:shadow-outline transition duration-300 ease-in-out"
-            >
-              削除
-            </button>
-          </motion.div>
-        ))}
-      </AnimatePresence>
-    </div>
-  )
-}
-        """,
-        f'app/components/LoginButton.{TSX_EXT}': """
-'use client'
-
-import { useSession, useSupabaseClient } from '@supabase/auth-helpers-react'
-import { useState } from 'react'
-import { motion } from 'framer-motion'
-
-export default function LoginButton() {
-  const session = useSession()
-  const supabase = useSupabaseClient()
-  const [isLoading, setIsLoading] = useState(false)
-
-  async function handleSignIn() {
-    setIsLoading(true)
-    try {
-      const { error } = await supabase.auth.signInWithOAuth({
-        provider: 'google',
-        options: {
-          redirectTo: `${window.location.origin}/auth/callback`
-        }
-      })
-
-      if (error) {
-        console.error('ログインエラー:', error)
-        alert(`ログインエラー: ${error.message}`)
-      }
-    } catch (error) {
-      console.error('予期せぬエラー:', error)
-      alert('予期せぬエラーが発生しました。コンソールを確認してください。')
-    }
-    // ログイン処理が完了しても、リダイレクトされるまでローディング状態を維持
-  }
-
-  async function handleSignOut() {
-    setIsLoading(true)
-    try {
-      const { error } = await supabase.auth.signOut()
-      if (error) {
-        console.error('ログアウトエラー:', error)
-        alert(`ログアウトエラー: ${error.message}`)
-      }
-    } catch (error) {
-      console.error('予期せぬエラー:', error)
-      alert('予期せぬエラーが発生しました。コンソールを確認してください。')
-    } finally {
-      setIsLoading(false)
-    }
-  }
-
-  return (
-    <motion.div
-      whileHover={{ scale: 1.05 }}
-      whileTap={{ scale: 0.95 }}
-    >
-      {session ? (
-        <button
-          onClick={handleSignOut}
-          className="bg-red-500 hover:bg-red-700 text-white font-bold py-2 px-4 rounded shadow-md transition duration-300 ease-in-out flex items-center"
-          disabled={isLoading}
-        >
-          {isLoading ? (
-            <>
-              <svg className="animate-spin -ml-1 mr-3 h-5 w-5 text-white" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">
-                <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
-                <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
-              </svg>
-              ログアウト中...
-            </>
-          ) : (
-            'ログアウト'
-          )}
-        </button>
-      ) : (
-        <button
-          onClick={handleSignIn}
-          className="bg-blue-500 hover:bg-blue-700 text-white font-bold py-2 px-4 rounded shadow-md transition duration-300 ease-in-out flex items-center"
-          disabled={isLoading}
-        >
-          {isLoading ? (
-            <>
-              <svg className="animate-spin -ml-1 mr-3 h-5 w-5 text-white" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">
-                <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
-                <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
-              </svg>
-              ログイン中...
-            </>
-          ) : (
-            <>
-              <svg className="w-5 h-5 mr-2" viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg">
-                <path fill="#fff" d="M12.24 10.285V14.4h6.806c-.275 1.765-2.056 5.174-6.806 5.174-4.095 0-7.439-3.389-7.439-7.574s3.345-7.574 7.439-7.574c2.33 0 3.891.989 4.785 1.849l3.254-3.138C18.189 1.186 15.479 0 12.24 0c-6.635 0-12 5.365-12 12s5.365 12 12 12c6.926 0 11.52-4.869 11.52-11.726 0-.788-.085-1.39-.189-1.989H12.24z"/>
-              </svg>
-              Googleでログイン
-            </>
-          )}
-        </button>
-      )}
-    </motion.div>
-  )
-}
-        """,
-        f'app/store/index.{FILE_EXT}': """
-import { configureStore } from '@reduxjs/toolkit'
-import tasksReducer from './tasksSlice'
-
-export const store = configureStore({
-  reducer: {
-    tasks: tasksReducer,
-  },
-})
-
-export type RootState = ReturnType<typeof store.getState>
-export type AppDispatch = typeof store.dispatch
-        """,
-        f'app/store/tasksSlice.{FILE_EXT}': """
-import { createSlice, PayloadAction } from '@reduxjs/toolkit'
-
-interface Task {
-  id: number
-  title: string
-  completed: boolean
-}
-
-const initialState: Task[] = []
-
-let nextId = 1
-
-const tasksSlice = createSlice({
-  name: 'tasks',
-  initialState,
-  reducers: {
-    addTask: (state, action: PayloadAction<{ title: string }>) => {
-      state.push({ id: nextId++, title: action.payload.title, completed: false })
-    },
-    toggleTask: (state, action: PayloadAction<number>) => {
-      const task = state.find(task => task.id === action.payload)
-      if (task) {
-        task.completed = !task.completed
-      }
-    },
-    removeTask: (state, action: PayloadAction<number>) => {
-      return state.filter(task => task.id !== action.payload)
-    },
-  },
-})
-
-export const { addTask, toggleTask, removeTask } = tasksSlice.actions
-export default tasksSlice.reducer
-        """,
-        f'app/utils/supabase.{FILE_EXT}': """
-import { createClient } from '@supabase/supabase-js'
-
-const supabaseUrl = process.env.NEXT_PUBLIC_SUPABASE_URL
-const supabaseAnonKey = process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY
-
-if (!supabaseUrl || !supabaseAnonKey) {
-  throw new Error('Supabase URLまたは匿名キーが設定されていせん。')
-}
-
-export const supabase = createClient(supabaseUrl, supabaseAnonKey)
-        """,
-        f'app/auth/callback/route.{FILE_EXT}': """
-import { createRouteHandlerClient } from '@supabase/auth-helpers-nextjs'
-import { cookies } from 'next/headers'
-import { NextResponse } from 'next/server'
-import { NextRequest } from 'next/server'
-
-export async function GET(request: NextRequest) {
-  const requestUrl = new URL(request.url)
-  const code = requestUrl.searchParams.get('code')
-
-  if (code) {
-    const supabase = createRouteHandlerClient({ cookies })
-    await supabase.auth.exchangeCodeForSession(code)
-  }
-
-  // URL to redirect to after sign in process completes
-  return NextResponse.redirect(requestUrl.origin)
-}
-        """,
-    }
-
-    for file_path, content in files.items():
-        create_file(file_path, content.strip())
+    for path, content in render_project_files(USE_TYPESCRIPT, features, font_source).items():
+        create_file(path, content)
 
     # .env.localファイルをプロジェクトディレクトリにコピー
+    # 存在しない場合は、資格情報の入力後に build.py が作成する
     if os.path.exists('../.env.local'):
         shutil.copy('../.env.local', '.env.local')
-        console.print("[green].env.localファイルをプロジェクトディレクトリにコピーしました。[/green]")
-        console.print("[green]新しい.env.localファイルをコピーしました。[/green]")
-    else:
-        # .env.localファイルが存在しない場合、新しく作成
-        env_content = f"""
-NEXT_PUBLIC_SUPABASE_URL={supabase_url}
-NEXT_PUBLIC_SUPABASE_ANON_KEY={supabase_anon_key}
-        """.strip()
-        create_file('.env.local', env_content)
-        console.print("[green]新しい.env.localファイルを作成しました。[/green]")
+        emit(MESSAGE, level='success', text=".env.localファイルをプロジェクトディレクトリにコピーしました。")
 
 
 
@@ -379,7 +97,35 @@ def create_file(path, content):
     if directory:
         os.makedirs(directory, exist_ok=True)
     
-    with open(path, 'w') as f:
+    with open(path, 'wb' if isinstance(content, bytes) else 'w') as f:
         f.write(content)
-    
-    console.print(f"[green]ファイル '{path}' が正常に作成されました。[/green]")
\ No newline at end of file
+
+    emit(FILE_WRITTEN, path=path, size=len(content))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="プロジェクトファイルをアーカイブとして出力します")
+    parser.add_argument('--archive', required=True, help="出力先（ファイルパス、- で標準出力、tcp://host:port でソケット）")
+    parser.add_argument('--format', choices=FORMATS, help="アーカイブ形式（省略時は出力先の拡張子から判定）")
+    parser.add_argument('--name', default='frontend-next', help="アーカイブ内のプロジェクトディレクトリ名")
+    parser.add_argument('--js', action='store_true', help="JavaScriptで生成する")
+    parser.add_argument('--persist', action='store_true', help="タスクを localStorage に保存するミドルウェアを生成する")
+    parser.add_argument('--font', help="サブセット化して同梱するフォント（省略時は Noto Sans JP / Noto Sans CJK を探す）")
+    parser.add_argument('--google-font', action='store_true',
+                        help="フォントを同梱せず next/font/google を使う（ビルド時にネットワークが必要）")
+    args = parser.parse_args(argv)
+    if args.font and not os.path.isfile(args.font):
+        parser.error(f"フォントが見つかりません: {args.font}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # 標準出力にアーカイブを書く場合に備えて、警告などは標準エラーへ出す
+    bus.clear()
+    bus.add_sink(ConsoleSink(Console(stderr=True)))
+    features = {'persist'} if args.persist else set()
+    font_source = resolve_local_font(args.font, args.google_font)
+    if font_source:
+        features.add('local_font')
+    create_project_archive(args.name, not args.js, args.archive, args.format, features, font_source)
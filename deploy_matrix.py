@@ -0,0 +1,126 @@
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from rich.table import Table
+from rich.markup import escape
+from events import emit, WARNING, console
+from command_runner import run_command, STEP_TIMEOUTS
+
+
+DEFAULT_TARGETS = ('preview', 'staging', 'production')
+PRODUCTION = 'production'
+
+
+def parse_targets(value):
+    # カンマ区切りのターゲット名（重複は除き、指定順を保つ）
+    targets = []
+    for target in value.split(','):
+        target = target.strip()
+        if target and target not in targets:
+            targets.append(target)
+    if not targets:
+        raise argparse.ArgumentTypeError("デプロイ先のターゲットを1つ以上指定してください。")
+    return targets
+
+
+def parse_alias(value):
+    target, _, domain = value.partition('=')
+    if not target.strip() or not domain.strip():
+        raise argparse.ArgumentTypeError(f"エイリアスは ターゲット=ドメイン の形式で指定してください: {value}")
+    return target.strip(), domain.strip()
+
+
+def build_prebuilt(vercel_project_name):
+    # すべてのターゲットで共有する .vercel/output を1回だけビルドする。
+    # Supabaseの公開設定はターゲット間で共通で、サイトURLとコールバックURLはアプリが実行時のオリジンから求めるため、
+    # ビルド成果物はターゲットに依存しない
+    run_command("npm install vercel", step="vercel-install", description="Vercel CLIをインストールしています...")
+    run_command(f"vercel link --yes --project {vercel_project_name}", step="vercel-link",
+                description="Vercelプロジェクトにリンクしています...")
+    run_command("vercel pull --yes --environment=production", step="vercel-pull",
+                description="Vercelのプロジェクト設定を取得しています...")
+    run_command("vercel build --prod --yes", step="vercel-build", description="デプロイ用の成果物をビルドしています...")
+    return {}
+
+
+def push_target(target, alias=None):
+    # --prebuilt は成果物と同じ本番向けのデプロイを要求するため、本番以外は本番ドメインを割り当てずにデプロイする。
+    # そのため preview / staging もVercelのPreview環境ではなく、本番の環境変数を使う未昇格の本番デプロイになる
+    command = "vercel deploy --prebuilt --prod"
+    if target != PRODUCTION:
+        command += " --skip-domain"
+    result = {'target': target, 'alias': alias, 'url': None, 'deploy_url': None, 'error': None, 'log_path': None}
+    started = time.monotonic()
+    try:
+        # アップロードの待ち時間が中心でCPUをほとんど使わないため、Nodeジョブの同時実行数の制限から外す
+        deployed = run_command(command, step=f"deploy-{target}", timeout=STEP_TIMEOUTS['deploy'], node_job=False,
+                               description=f"{target} にデプロイしています...")
+        deploy_url = deployed.deploy_url or (deployed.tail[-1].strip() if deployed.tail else None)
+        result['deploy_url'] = result['url'] = deploy_url
+        if not deploy_url:
+            result['error'] = "デプロイURLを取得できませんでした"
+        elif alias:
+            run_command(f"vercel alias set {deploy_url} {alias}", step=f"alias-{target}", node_job=False,
+                        description=f"{target} に {alias} を割り当てています...")
+            result['url'] = f"https://{alias}"
+    except subprocess.SubprocessError as e:
+        if isinstance(e, subprocess.TimeoutExpired):
+            result['error'] = f"タイムアウト（{e.timeout:.0f}秒）"
+        else:
+            result['error'] = f"終了コード {getattr(e, 'returncode', '?')}"
+        result['log_path'] = getattr(e, 'log_path', None)
+    result['duration'] = time.monotonic() - started
+    return result
+
+
+def push_targets(targets, aliases=None, deployed=None):
+    # 共有の成果物をすべてのターゲットへ同時にデプロイする（全体の所要時間は最も遅いターゲット1つ分になる）。
+    # deployed は前回の実行で成功したターゲットの結果で、エイリアスが同じならデプロイし直さない。
+    # 一部のターゲットが失敗しても、成功したターゲットの結果を返す
+    aliases = aliases or {}
+    deployed = deployed or {}
+    reused = {target: dict(deployed[target], reused=True) for target in targets
+              if target in deployed and deployed[target].get('alias') == aliases.get(target)}
+    pending = [target for target in targets if target not in reused]
+    pushed = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            for result in executor.map(lambda target: push_target(target, aliases.get(target)), pending):
+                pushed[result['target']] = result
+    results = [reused.get(target) or pushed[target] for target in targets]
+    failed = [result['target'] for result in results if result['error']]
+    if failed:
+        emit(WARNING, message=f"デプロイに失敗したターゲット: {', '.join(failed)}。再実行すると失敗したターゲットだけをデプロイします。")
+    return {
+        'deploy_urls': {result['target']: result['url'] for result in results if not result['error']},
+        'results': results,
+        'failed': failed,
+    }
+
+
+def primary_url(deploy_urls):
+    # Supabaseのサイトとして使うURL。本番がなければ最初のターゲットを使う
+    return deploy_urls.get(PRODUCTION) or next(iter(deploy_urls.values()), None)
+
+
+def print_matrix_results(results, settings_updated=None):
+    table = Table(title="デプロイ結果")
+    for column in ('ターゲット', '状態', 'URL', 'Supabase設定', '時間'):
+        table.add_column(column, justify='right' if column == '時間' else 'left')
+    if settings_updated is None:
+        settings = '-'
+    else:
+        settings = '[green]更新済み[/green]' if settings_updated else '[red]失敗[/red]'
+    for result in results:
+        if result['error']:
+            status = f"[red]失敗[/red] {escape(result['error'])}"
+            if result.get('log_path'):
+                status += f"（ログ: {escape(result['log_path'])}）"
+        elif result.get('reused'):
+            status = '[green]成功[/green]（前回の実行）'
+        else:
+            status = '[green]成功[/green]'
+        table.add_row(result['target'], status, escape(result['url'] or '-'),
+                      settings if not result['error'] else '-', f"{result['duration']:.1f}s")
+    console.print(table)
@@ -0,0 +1,225 @@
+import sys
+import json
+import time
+import threading
+from collections import deque, namedtuple
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+from rich.panel import Panel
+from rich.console import Group
+from rich.text import Text
+from rich.markup import escape
+
+# イベントの種類
+FILE_WRITTEN = 'file_written'
+STEP_STARTED = 'step_started'
+STEP_FINISHED = 'step_finished'
+SUBPROCESS_LINE = 'subprocess_line'
+WARNING = 'warning'
+# パイプラインの見出しや結果のメッセージ（level は banner / info / success / error）
+MESSAGE = 'message'
+
+EVENT_KINDS = (FILE_WRITTEN, STEP_STARTED, STEP_FINISHED, SUBPROCESS_LINE, WARNING, MESSAGE)
+
+MESSAGE_STYLES = {'banner': 'bold cyan', 'info': 'cyan', 'success': 'green', 'error': 'bold red'}
+
+Event = namedtuple('Event', ['kind', 'time', 'fields'])
+
+OUTPUT_MODES = ('console', 'live', 'json', 'null')
+
+# イベントにしない人向けの出力（手順の説明や結果の表）用のコンソール。
+# json では標準出力をJSON Lines専用にするため標準エラーへ出し、null では何も表示しない
+console = Console()
+
+
+def shared_console():
+    return console
+
+
+class EventBus:
+    # プロセス内のイベントバス。種類ごとに購読しているシンクを事前に振り分けておき、
+    # 購読者のいない種類の emit は辞書を1回引くだけで終わるようにする
+    def __init__(self):
+        self.sinks = ()
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def _update_routes(self):
+        self.routes = {kind: tuple(s for s in self.sinks if kind in s.kinds) for kind in EVENT_KINDS}
+
+    def add_sink(self, sink):
+        with self.lock:
+            self.sinks = self.sinks + (sink,)
+            self._update_routes()
+        return sink
+
+    def remove_sink(self, sink):
+        with self.lock:
+            self.sinks = tuple(s for s in self.sinks if s is not sink)
+            self._update_routes()
+        sink.close()
+
+    def clear(self):
+        with self.lock:
+            sinks, self.sinks = self.sinks, ()
+            self._update_routes()
+        for sink in sinks:
+            sink.close()
+
+    def wants(self, kind):
+        return bool(self.routes.get(kind))
+
+    def emit(self, kind, **fields):
+        sinks = self.routes.get(kind)
+        if not sinks:
+            return
+        event = Event(kind, time.time(), fields)
+        for sink in sinks:
+            sink.handle(event)
+
+
+class NullSink:
+    # ベンチマーク用。どの種類も購読しないため emit のコストはほぼゼロになる
+    kinds = ()
+
+    def handle(self, event):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConsoleSink:
+    # 従来どおり rich のコンソールに1件ずつ表示する（サブプロセスの出力は表示しない）
+    kinds = (FILE_WRITTEN, STEP_STARTED, STEP_FINISHED, WARNING, MESSAGE)
+
+    def __init__(self, console=None):
+        self.console = console or shared_console()
+
+    def handle(self, event):
+        fields = event.fields
+        if event.kind == FILE_WRITTEN:
+            self.console.print(f"[green]ファイル '{escape(fields['path'])}' が正常に作成されました。[/green]")
+        elif event.kind == STEP_STARTED:
+            if fields.get('description'):
+                self.console.print(f"[cyan]{escape(fields['description'])}[/cyan]")
+        elif event.kind == STEP_FINISHED:
+            if fields.get('skipped'):
+                self.console.print(f"[dim]フェーズ '{escape(fields['step'])}' は前回から変更がないためスキップします。[/dim]")
+            elif fields.get('returncode'):
+                log = f"、ログ: {escape(fields['log_path'])}" if fields.get('log_path') else ''
+                self.console.print(f"[bold red]ステップ '{escape(fields['step'])}' が失敗しました（終了コード {fields['returncode']}{log}）[/bold red]")
+        elif event.kind == WARNING:
+            self.console.print(f"[yellow]{escape(fields['message'])}[/yellow]")
+        elif event.kind == MESSAGE:
+            style = MESSAGE_STYLES.get(fields.get('level'), '')
+            text = Text(fields['text'], style=style)
+            self.console.print(Panel(text) if fields.get('level') == 'banner' else text)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    # 機械向けに1イベント1行のJSONで出力する
+    kinds = EVENT_KINDS
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def handle(self, event):
+        line = json.dumps({'event': event.kind, 'time': event.time, **event.fields}, ensure_ascii=False, default=str)
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def close(self):
+        if self.stream not in (sys.stdout, sys.stderr):
+            self.stream.close()
+
+
+class LiveDashboardSink:
+    # イベントでは状態を更新するだけにし、描画は rich の Live が上限のフレームレートでまとめて行う
+    kinds = EVENT_KINDS
+
+    def __init__(self, console=None, fps=4, tail_lines=8):
+        self.files_written = 0
+        self.last_file = ''
+        self.steps = {}
+        self.finished = deque(maxlen=6)
+        self.lines = deque(maxlen=tail_lines)
+        self.warnings = deque(maxlen=5)
+        self.messages = deque(maxlen=5)
+        self.live = Live(get_renderable=self.render, console=console or shared_console(), refresh_per_second=fps, transient=False)
+        self.live.start()
+
+    def handle(self, event):
+        fields = event.fields
+        if event.kind == FILE_WRITTEN:
+            self.files_written += 1
+            self.last_file = fields['path']
+        elif event.kind == STEP_STARTED:
+            self.steps[fields['step']] = (event.time, fields.get('description') or fields.get('command', ''))
+        elif event.kind == STEP_FINISHED:
+            started, _ = self.steps.pop(fields['step'], (event.time, ''))
+            status = 'スキップ' if fields.get('skipped') else ('失敗' if fields.get('returncode') else '完了')
+            self.finished.append((fields['step'], status, event.time - started))
+        elif event.kind == SUBPROCESS_LINE:
+            self.lines.append(f"[{fields['step']}] {fields['line']}")
+        elif event.kind == WARNING:
+            self.warnings.append(fields['message'])
+        elif event.kind == MESSAGE:
+            self.messages.append((fields['text'], MESSAGE_STYLES.get(fields.get('level'), '')))
+
+    def render(self):
+        now = time.time()
+        table = Table(show_header=True, header_style='bold cyan', expand=True)
+        table.add_column('ステップ')
+        table.add_column('状態')
+        table.add_column('経過', justify='right')
+        for step, status, elapsed in list(self.finished):
+            table.add_row(escape(step), status, f'{elapsed:.1f}s')
+        for step, (started, description) in list(self.steps.items()):
+            table.add_row(escape(step), f'実行中 {escape(description)}', f'{now - started:.1f}s')
+        parts = [Text(text, style=style) for text, style in list(self.messages)]
+        parts += [table, f"作成したファイル: {self.files_written} {escape(self.last_file)}"]
+        if self.lines:
+            parts.append(Panel(Text('\n'.join(self.lines)), title='出力', border_style='dim'))
+        for message in list(self.warnings):
+            parts.append(Text(message, style='yellow'))
+        return Group(*parts)
+
+    def close(self):
+        self.live.stop()
+
+
+bus = EventBus()
+
+
+def emit(kind, **fields):
+    bus.emit(kind, **fields)
+
+
+def configure_output(mode='console', events_file=None):
+    bus.clear()
+    console.file = sys.stderr if mode == 'json' else sys.stdout
+    console.quiet = mode == 'null'
+    if mode == 'console':
+        bus.add_sink(ConsoleSink())
+    elif mode == 'live':
+        bus.add_sink(LiveDashboardSink())
+    elif mode == 'json':
+        bus.add_sink(JsonLinesSink())
+    elif mode == 'null':
+        bus.add_sink(NullSink())
+    else:
+        raise ValueError(f"不明な出力モードです: {mode}（{', '.join(OUTPUT_MODES)} のいずれか）")
+    if events_file:
+        bus.add_sink(JsonLinesSink(open(events_file, 'a', encoding='utf-8')))
+    return bus
+
+
+# 何も設定しなくても従来どおりコンソールに表示されるようにする
+bus.add_sink(ConsoleSink())
@@ -0,0 +1,118 @@
+import io
+import os
+import re
+from checkpoint import fingerprint, file_hash
+from events import emit, WARNING
+
+# 生成するプロジェクト内のサブセットフォント（app/layout から next/font/local で読み込む）
+FONT_OUTPUT = 'app/fonts/subset.woff2'
+FONT_CACHE_DIR = os.path.join('.zoltraak', 'fonts')
+
+# 同梱して再配布できるよう、SIL Open Font License の Noto Sans JP / Noto Sans CJK だけを探す
+REPO_FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+FONT_SEARCH_PATHS = [
+    os.path.join(REPO_FONT_DIR, 'NotoSansJP-Regular.ttf'),
+    os.path.join(REPO_FONT_DIR, 'NotoSansJP-Regular.otf'),
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/opentype/noto-cjk/NotoSansCJK-Regular.ttc',
+    os.path.expanduser('~/Library/Fonts/NotoSansJP-Regular.otf'),
+    os.path.expanduser('~/Library/Fonts/NotoSansJP-Regular.ttf'),
+    os.path.expanduser('~/Library/Fonts/NotoSansCJKjp-Regular.otf'),
+    '/Library/Fonts/NotoSansJP-Regular.otf',
+    '/Library/Fonts/NotoSansCJKjp-Regular.otf',
+]
+
+# ラテン文字（ASCII、Latin-1、よく使う約物）は常に含める
+LATIN_RANGES = [(0x20, 0x7e), (0xa0, 0xff), (0x2013, 0x2014), (0x2018, 0x201d), (0x2026, 0x2026)]
+# UIの文字列にまだ現れていなくても日本語の表示で使う約物
+JAPANESE_PUNCTUATION = '、。・ー「」『』（）！？：　'
+
+# 文字列リテラルは残し、コメントだけを取り除く
+COMMENT_OR_STRING = re.compile(
+    r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)|//[^\n]*|/\*.*?\*/', re.S)
+
+
+def ui_characters(sources):
+    # テンプレートの文字列やJSXのテキストに含まれる非ASCII文字を集める
+    characters = set()
+    for source in sources:
+        text = COMMENT_OR_STRING.sub(lambda match: match.group(1) or ' ', source)
+        characters.update(c for c in text if ord(c) > 0x7e)
+    return characters
+
+
+def glyph_set(sources):
+    characters = {chr(code) for start, end in LATIN_RANGES for code in range(start, end + 1)}
+    characters.update(JAPANESE_PUNCTUATION)
+    characters.update(ui_characters(sources))
+    return ''.join(sorted(characters))
+
+
+def find_font_source(path=None):
+    candidates = [path] if path else [os.getenv('ZOLTRAAK_FONT')] + FONT_SEARCH_PATHS
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate):
+            return os.path.abspath(candidate)
+    return None
+
+
+def check_subsetter():
+    try:
+        import fontTools.subset
+        import brotli
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_local_font(path=None, google_font=False):
+    # サブセット化に使うフォントを返す。使えない場合は警告して None を返し、next/font/google に戻す
+    if google_font:
+        return None
+    if not check_subsetter():
+        emit(WARNING, message="フォントのサブセット化には fonttools と brotli が必要です: pip install 'fonttools[woff]'。"
+                              "next/font/google を使用するため、ビルド時にネットワークが必要です。")
+        return None
+    source = find_font_source(path)
+    if source is None:
+        emit(WARNING, message="サブセット化するフォント（Noto Sans JP / Noto Sans CJK）が見つかりません。"
+                              "next/font/google を使用するため、ビルド時にネットワークが必要です。"
+                              "オフラインでビルドするには --font または環境変数 ZOLTRAAK_FONT でフォントを指定してください。")
+    return source
+
+
+def subset_font(source, text):
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    options = subset.Options()
+    options.flavor = 'woff2'
+    # ブラウザでの表示にはヒンティングは不要なため削ってサイズを減らす
+    options.hinting = False
+    options.desubroutinize = True
+    # .ttc の場合は最初のフォント（Noto Sans CJK では JP）を使う
+    font = TTFont(source, fontNumber=0)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    subset.save_font(font, buffer, options)
+    font.close()
+    return buffer.getvalue()
+
+
+def vendor_font(sources, font_source, cache_dir=FONT_CACHE_DIR):
+    # CJKフォントのサブセット化は数秒かかるため、フォントと文字集合が同じなら前回の結果を使う
+    text = glyph_set(sources)
+    cached = os.path.join(cache_dir, fingerprint(file_hash(font_source), text) + '.woff2')
+    try:
+        with open(cached, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    data = subset_font(font_source, text)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cached, 'wb') as f:
+        f.write(data)
+    return data
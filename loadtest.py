@@ -0,0 +1,230 @@
+import os
+import json
+import math
+import time
+import asyncio
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from rich.table import Table
+from command_runner import LOG_DIR, node_env, kill_process_tree_async
+from events import emit, STEP_STARTED, STEP_FINISHED, WARNING, MESSAGE, console
+
+
+BASELINE_FILE = os.path.join('.zoltraak', 'loadtest.json')
+DEFAULT_PATHS = ('/', '/auth/callback')
+DEFAULT_PORT = 3100
+DEFAULT_CONCURRENCY = 20
+DEFAULT_DURATION = 10.0
+DEFAULT_THRESHOLD = 0.2
+WARMUP_SECONDS = 1.0
+REQUEST_TIMEOUT = 10.0
+
+
+class LoadTestError(Exception):
+    pass
+
+
+async def read_response(reader):
+    # HTTP/1.1 のレスポンスを読み切り、ステータスコードを返す（Keep-Alive で接続を再利用するため本文も読む）
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("サーバーが接続を閉じました")
+    version, status = status_line.split()[:2]
+    status = int(status)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection == 'keep-alive' if version == b'HTTP/1.0' else connection != 'close'
+    return status, keep_alive
+
+
+async def worker(host, port, paths, deadline, samples, errors, offset):
+    reader = writer = None
+    index = offset
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: keep-alive\r\n\r\n'.encode())
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(read_response(reader), REQUEST_TIMEOUT)
+            elapsed = time.perf_counter() - started
+            if status >= 500:
+                errors[path] = errors.get(path, 0) + 1
+            else:
+                samples[path].append(elapsed)
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        except (OSError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            errors[path] = errors.get(path, 0) + 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    # nearest-rank 法
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, errors, elapsed):
+    results = {}
+    for path, values in samples.items():
+        values.sort()
+        results[path] = {
+            'requests': len(values),
+            'errors': errors.get(path, 0),
+            'rps': len(values) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(values, 0.50) * 1000 if values else None,
+            'p95_ms': percentile(values, 0.95) * 1000 if values else None,
+            'p99_ms': percentile(values, 0.99) * 1000 if values else None,
+        }
+    return results
+
+
+async def generate_load(base_url, paths=DEFAULT_PATHS, concurrency=DEFAULT_CONCURRENCY, duration=DEFAULT_DURATION):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    paths = list(paths)
+
+    # ウォームアップ（結果には含めない）
+    warmup = {path: [] for path in paths}
+    await worker(host, port, paths, time.perf_counter() + WARMUP_SECONDS, warmup, {}, 0)
+
+    samples = {path: [] for path in paths}
+    errors = {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(host, port, paths, deadline, samples, errors, i) for i in range(concurrency)))
+    return summarize(samples, errors, time.perf_counter() - started)
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_baseline(results, settings, path=BASELINE_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'settings': settings, 'results': results, 'time': time.time()}, f, indent=2)
+
+
+def find_regressions(results, baseline, threshold):
+    # エラー率、p95 の悪化、RPS の低下が閾値を超えたパスを返す
+    regressions = []
+    previous = baseline.get('results', {}) if baseline else {}
+    for path, current in results.items():
+        total = current['requests'] + current['errors']
+        if total and current['errors'] / total > threshold:
+            regressions.append(f"{path}: エラー率 {current['errors'] / total:.0%}")
+            continue
+        before = previous.get(path)
+        if not before:
+            continue
+        if current['p95_ms'] is None or current['requests'] == 0:
+            regressions.append(f"{path}: 成功したリクエストがありません")
+            continue
+        if before.get('p95_ms') and current['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{path}: p95 {before['p95_ms']:.1f}ms → {current['p95_ms']:.1f}ms")
+        if before.get('rps') and current['rps'] < before['rps'] * (1 - threshold):
+            regressions.append(f"{path}: RPS {before['rps']:.1f} → {current['rps']:.1f}")
+    return regressions
+
+
+def print_results(results, baseline):
+    previous = baseline.get('results', {}) if baseline else {}
+    table = Table(title="負荷テスト結果")
+    for column in ('パス', 'リクエスト', 'エラー', 'RPS', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', '前回 p95 (ms)'):
+        table.add_column(column, justify='left' if column == 'パス' else 'right')
+    def fmt(value):
+        return '-' if value is None else f'{value:.1f}'
+    for path, r in results.items():
+        table.add_row(path, str(r['requests']), str(r['errors']), fmt(r['rps']), fmt(r['p50_ms']),
+                      fmt(r['p95_ms']), fmt(r['p99_ms']), fmt(previous.get(path, {}).get('p95_ms')))
+    console.print(table)
+
+
+async def start_next_server(port):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log = open(os.path.join(LOG_DIR, 'loadtest-server.log'), 'w')
+    process = await asyncio.create_subprocess_exec(
+        'npx', 'next', 'start', '-p', str(port),
+        stdout=log, stderr=asyncio.subprocess.STDOUT, env=node_env(), start_new_session=True,
+    )
+    log.close()
+    return process
+
+
+async def load_test_gate(wait_for_server, paths=DEFAULT_PATHS, concurrency=DEFAULT_CONCURRENCY,
+                         duration=DEFAULT_DURATION, threshold=DEFAULT_THRESHOLD, port=DEFAULT_PORT,
+                         baseline_file=BASELINE_FILE):
+    # ビルド済みのアプリを next start で起動して負荷をかけ、前回から悪化していれば False を返す
+    base_url = f'http://127.0.0.1:{port}'
+    settings = {'paths': list(paths), 'concurrency': concurrency, 'duration': duration}
+    emit(STEP_STARTED, step='loadtest', description=f"負荷テストを実行しています（同時接続 {concurrency}、{duration:.0f}秒）...")
+    started = time.monotonic()
+    # サーバーを起動できなかった場合も、ダッシュボードで実行中のまま残らないよう必ず終了を通知する
+    returncode = 1
+    try:
+        process = await start_next_server(port)
+        try:
+            if not await wait_for_server(base_url):
+                raise LoadTestError("next start の起動を確認できませんでした。")
+            results = await generate_load(base_url, paths, concurrency, duration)
+        finally:
+            await kill_process_tree_async(process)
+
+        baseline = load_baseline(baseline_file)
+        if baseline and baseline.get('settings') != settings:
+            emit(WARNING, message="負荷テストの設定が前回と異なるため、前回の結果との比較を行いません。")
+            baseline = None
+        print_results(results, baseline)
+        regressions = find_regressions(results, baseline, threshold)
+        returncode = 1 if regressions else 0
+    finally:
+        emit(STEP_FINISHED, step='loadtest', returncode=returncode, duration=time.monotonic() - started)
+    if regressions:
+        emit(MESSAGE, level='error', text=f"レイテンシが前回から {threshold:.0%} を超えて悪化しました:\n"
+                                             + '\n'.join(f"- {regression}" for regression in regressions))
+        return False
+    # 合格した結果だけを次回の基準として保存する
+    save_baseline(results, settings, baseline_file)
+    return True
+
+
+def run_load_test_gate(wait_for_server, **options):
+    # 実行中のイベントループの有無にかかわらず同期的に呼べるようにする
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(load_test_gate(wait_for_server, **options))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, load_test_gate(wait_for_server, **options)).result()
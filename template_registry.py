@@ -0,0 +1,80 @@
+import os
+import re
+import hashlib
+from functools import lru_cache
+from importlib import resources
+
+# テンプレートはパッケージデータとして templates/ 以下に TypeScript で保存する
+TEMPLATE_PACKAGE = 'templates'
+
+# TypeScript専用の部分は /*ts*/ ... /*/ts*/ で囲む（行単位のブロックとインラインの両方に対応）
+TS_BLOCK = re.compile(r'^[ \t]*/\*ts\*/\n(.*?)^[ \t]*/\*/ts\*/\n', re.M | re.S)
+TS_INLINE = re.compile(r'/\*ts\*/(.*?)/\*/ts\*/', re.S)
+
+# 生成オプションに応じた部分は /*if:機能名*/ ... /*/if:機能名*/（無効時のみは unless）で囲む
+FEATURE_BLOCK = re.compile(r'^[ \t]*/\*(if|unless):(\w+)\*/\n(.*?)^[ \t]*/\*/\1:\2\*/\n', re.M | re.S)
+FEATURE_INLINE = re.compile(r'/\*(if|unless):(\w+)\*/(.*?)/\*/\1:\2\*/', re.S)
+
+JS_EXTENSIONS = {'.tsx': '.jsx', '.ts': '.js'}
+# next.config.js などの設定ファイルはJavaScriptのまま保存する
+TEMPLATE_EXTENSIONS = set(JS_EXTENSIONS) | {'.js'}
+
+
+@lru_cache(maxsize=None)
+def load_template(name):
+    # 初めて参照されたときにだけ読み込む
+    return resources.files(TEMPLATE_PACKAGE).joinpath(name).read_text(encoding='utf-8')
+
+
+def render_template(name, typescript=True, features=frozenset()):
+    return _render_template(name, typescript, frozenset(features))
+
+
+@lru_cache(maxsize=None)
+def _render_template(name, typescript, features):
+    # (テンプレート, オプション) ごとに描画結果をメモ化する
+    def select(match):
+        enabled = match.group(2) in features
+        return match.group(3) if enabled == (match.group(1) == 'if') else ''
+    source = FEATURE_INLINE.sub(select, FEATURE_BLOCK.sub(select, load_template(name)))
+    if typescript:
+        content = TS_INLINE.sub(r'\1', TS_BLOCK.sub(r'\1', source))
+    else:
+        content = TS_INLINE.sub('', TS_BLOCK.sub('', source))
+    return content.strip()
+
+
+def output_path(name, typescript=True):
+    if typescript:
+        return name
+    root, ext = os.path.splitext(name)
+    return root + JS_EXTENSIONS.get(ext, ext)
+
+
+def list_templates():
+    names = []
+    stack = [('', resources.files(TEMPLATE_PACKAGE))]
+    while stack:
+        prefix, directory = stack.pop()
+        for entry in directory.iterdir():
+            if entry.is_dir():
+                if entry.name != '__pycache__':
+                    stack.append((prefix + entry.name + '/', entry))
+            elif os.path.splitext(entry.name)[1] in TEMPLATE_EXTENSIONS:
+                names.append(prefix + entry.name)
+    return sorted(names)
+
+
+def template_hashes(names):
+    # チェックポイント用にテンプレートのソースのハッシュを返す
+    return {name: hashlib.sha256(resources.files(TEMPLATE_PACKAGE).joinpath(name).read_bytes()).hexdigest() for name in names}
+
+
+def clear_cache():
+    load_template.cache_clear()
+    _render_template.cache_clear()
+
+
+def template_root():
+    # 監視用にテンプレートディレクトリの実パスを返す
+    return str(resources.files(TEMPLATE_PACKAGE))
@@ -0,0 +1,98 @@
+'use client'
+
+import { useSession, useSupabaseClient } from '@supabase/auth-helpers-react'
+import { useState } from 'react'
+import { motion } from 'framer-motion'
+
+export default function LoginButton() {
+  const session = useSession()
+  const supabase = useSupabaseClient()
+  const [isLoading, setIsLoading] = useState(false)
+
+  async function handleSignIn() {
+    setIsLoading(true)
+    try {
+      const { error } = await supabase.auth.signInWithOAuth({
+        provider: 'google',
+        options: {
+          redirectTo: `${window.location.origin}/auth/callback`
+        }
+      })
+
+      if (error) {
+        console.error('ログインエラー:', error)
+        alert(`ログインエラー: ${error.message}`)
+      }
+    } catch (error) {
+      console.error('予期せぬエラー:', error)
+      alert('予期せぬエラーが発生しました。コンソールを確認してください。')
+    }
+    // ログイン処理が完了しても、リダイレクトされるまでローディング状態を維持
+  }
+
+  async function handleSignOut() {
+    setIsLoading(true)
+    try {
+      const { error } = await supabase.auth.signOut()
+      if (error) {
+        console.error('ログアウトエラー:', error)
+        alert(`ログアウトエラー: ${error.message}`)
+      }
+    } catch (error) {
+      console.error('予期せぬエラー:', error)
+      alert('予期せぬエラーが発生しました。コンソールを確認してください。')
+    } finally {
+      setIsLoading(false)
+    }
+  }
+
+  return (
+    <motion.div
+      whileHover={{ scale: 1.05 }}
+      whileTap={{ scale: 0.95 }}
+    >
+      {session ? (
+        <button
+          onClick={handleSignOut}
+          className="bg-red-500 hover:bg-red-700 text-white font-bold py-2 px-4 rounded shadow-md transition duration-300 ease-in-out flex items-center"
+          disabled={isLoading}
+        >
+          {isLoading ? (
+            <>
+              <svg className="animate-spin -ml-1 mr-3 h-5 w-5 text-white" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">
+                <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
+                <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
+              </svg>
+              ログアウト中...
+            </>
+          ) : (
+            'ログアウト'
+          )}
+        </button>
+      ) : (
+        <button
+          onClick={handleSignIn}
+          className="bg-blue-500 hover:bg-blue-700 text-white font-bold py-2 px-4 rounded shadow-md transition duration-300 ease-in-out flex items-center"
+          disabled={isLoading}
+        >
+          {isLoading ? (
+            <>
+              <svg className="animate-spin -ml-1 mr-3 h-5 w-5 text-white" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">
+                <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
+                <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
+              </svg>
+              ログイン中...
+            </>
+          ) : (
+            <>
+              <svg className="w-5 h-5 mr-2" viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg">
+                <path fill="#fff" d="M12.24 10.285V14.4h6.806c-.275 1.765-2.056 5.174-6.806 5.174-4.095 0-7.439-3.389-7.439-7.574s3.345-7.574 7.439-7.574c2.33 0 3.891.989 4.785 1.849l3.254-3.138C18.189 1.186 15.479 0 12.24 0c-6.635 0-12 5.365-12 12s5.365 12 12 12c6.926 0 11.52-4.869 11.52-11.726 0-.788-.085-1.39-.189-1.989H12.24z"/>
+              </svg>
+              Googleでログイン
+            </>
+          )}
+        </button>
+      )}
+    </motion.div>
+  )
+}
@@ -0,0 +1,77 @@
+'use client'
+
+import { useSelector, useDispatch } from 'react-redux'
+import { addTask, toggleTask, removeTask } from '../store/tasksSlice'
+import { useState } from 'react'
+/*ts*/
+import { RootState, AppDispatch } from '../store'
+/*/ts*/
+import { useSession, useSupabaseClient } from '@supabase/auth-helpers-react'
+import { motion, AnimatePresence } from 'framer-motion'
+
+export default function TaskList() {
+  const tasks = useSelector((state/*ts*/: RootState/*/ts*/) => state.tasks)
+  const dispatch = useDispatch/*ts*/<AppDispatch>/*/ts*/()
+  const [newTask, setNewTask] = useState('')
+  const session = useSession()
+  const supabase = useSupabaseClient()
+
+  const handleAddTask = () => {
+    if (newTask.trim()) {
+      dispatch(addTask({ title: newTask }))
+      setNewTask('')
+    }
+  }
+
+  if (!session) {
+    return <div className="text-center text-gray-600">タスクを表示・管理するにはログインしてください。</div>
+  }
+
+  return (
+    <div className="w-full max-w-md bg-white shadow-lg rounded-lg p-6">
+      <div className="mb-4">
+        <input
+          type="text"
+          value={newTask}
+          onChange={(e) => setNewTask(e.target.value)}
+          className="shadow appearance-none border rounded w-full py-2 px-3 text-gray-700 leading-tight focus:outline-none focus:shadow-outline"
+          placeholder="新しいタスク"
+        />
+        <button
+          onClick={handleAddTask}
+          className="mt-2 w-full bg-blue-500 hover:bg-blue-700 text-white font-bold py-2 px-4 rounded focus:outline-none focus:shadow-outline transition duration-300 ease-in-out transform hover:scale-105"
+        >
+          タスクを追加
+        </button>
+      </div>
+      <AnimatePresence>
+        {tasks.map((task) => (
+          <motion.div
+            key={task.id}
+            initial={{ opacity: 0, y: -10 }}
+            animate={{ opacity: 1, y: 0 }}
+            exit={{ opacity: 0, y: -10 }}
+            transition={{ duration: 0.3 }}
+            className="mb-2 flex items-center bg-gray-100 p-3 rounded-lg"
+          >
+            <input
+              type="checkbox"
+              checked={task.completed}
+              onChange={() => dispatch(toggleTask(task.id))}
+              className="mr-2 form-checkbox h-5 w-5 text-blue-600"
+            />
+            <span className={`flex-grow ${task.completed ? 'line-through text-gray-500' : 'text-gray-800'}`}>
+              {task.title}
+            </span>
+            <button
+              onClick={() => dispatch(removeTask(task.id))}
+              className="ml-2 bg-red-500 hover:bg-red-700 text-white font-bold py-1 px-2 rounded focus:outline-none focus:shadow-outline transition duration-300 ease-in-out"
+            >
+              削除
+            </button>
+          </motion.div>
+        ))}
+      </AnimatePresence>
+    </div>
+  )
+}
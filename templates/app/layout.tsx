@@ -0,0 +1,39 @@
+import './globals.css'
+/*unless:local_font*/
+import { Inter } from 'next/font/google'
+/*/unless:local_font*/
+/*if:local_font*/
+import localFont from 'next/font/local'
+/*/if:local_font*/
+import { Providers } from './providers'
+
+/*unless:local_font*/
+const font = Inter({ subsets: ['latin'] })
+/*/unless:local_font*/
+/*if:local_font*/
+// 表示する文字だけに絞ったフォントを同梱し、ビルド時にGoogle Fontsを取得しない
+const font = localFont({
+  src: './fonts/subset.woff2',
+  display: 'swap',
+  fallback: ['system-ui', 'sans-serif'],
+})
+/*/if:local_font*/
+
+export const metadata = {
+  title: 'Task Manager',
+  description: 'A simple task manager built with Next.js, Redux, and Supabase',
+}
+
+export default function RootLayout({
+  children,
+}/*ts*/: {
+  children: React.ReactNode
+}/*/ts*/) {
+  return (
+    <html lang="en">
+      <body className={font.className}>
+        <Providers>{children}</Providers>
+      </body>
+    </html>
+  )
+}
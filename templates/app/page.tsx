@@ -0,0 +1,16 @@
+import TaskList from './components/TaskList'
+import LoginButton from './components/LoginButton'
+
+export default function Home() {
+  return (
+    <main className="flex min-h-screen flex-col items-center justify-center p-24 bg-gradient-to-r from-blue-100 to-purple-100">
+      <div className="bg-white shadow-2xl rounded-lg p-8 max-w-md w-full">
+        <h1 className="text-4xl font-bold text-center mb-8 text-gray-800">タスク管理アプリ</h1>
+        <div className="mb-8 flex justify-center">
+          <LoginButton />
+        </div>
+        <TaskList />
+      </div>
+    </main>
+  )
+}
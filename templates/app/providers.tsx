@@ -0,0 +1,19 @@
+'use client'
+
+import { Provider } from 'react-redux'
+import { store } from './store'
+import { createBrowserSupabaseClient } from '@supabase/auth-helpers-nextjs'
+import { SessionContextProvider } from '@supabase/auth-helpers-react'
+import { useState } from 'react'
+
+export function Providers({ children }/*ts*/: { children: React.ReactNode }/*/ts*/) {
+  const [supabaseClient] = useState(() => createBrowserSupabaseClient())
+
+  return (
+    <SessionContextProvider supabaseClient={supabaseClient}>
+      <Provider store={store}>
+        {children}
+      </Provider>
+    </SessionContextProvider>
+  )
+}
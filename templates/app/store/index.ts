@@ -0,0 +1,19 @@
+import { configureStore } from '@reduxjs/toolkit'
+import tasksReducer from './tasksSlice'
+/*if:persist*/
+import { persistMiddleware } from './persist'
+/*/if:persist*/
+
+export const store = configureStore({
+  reducer: {
+    tasks: tasksReducer,
+  },
+  /*if:persist*/
+  middleware: (getDefaultMiddleware) => getDefaultMiddleware().concat(persistMiddleware),
+  /*/if:persist*/
+})
+
+/*ts*/
+export type RootState = ReturnType<typeof store.getState>
+export type AppDispatch = typeof store.dispatch
+/*/ts*/
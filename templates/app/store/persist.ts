@@ -0,0 +1,117 @@
+/*ts*/
+import type { Middleware } from '@reduxjs/toolkit'
+import type { Task } from './tasksSlice'
+
+/*/ts*/
+// 保存形式を変えたらバージョンを上げる（古いバージョンのデータは読み込まずに削除する）
+const SCHEMA_VERSION = 1
+const PREFIX = 'tasks'
+const VERSION_KEY = `${PREFIX}:version`
+const INDEX_KEY = `${PREFIX}:v${SCHEMA_VERSION}:index`
+const itemKey = (id/*ts*/: number/*/ts*/) => `${PREFIX}:v${SCHEMA_VERSION}:item:${id}`
+
+// アイドル時間がなくてもこの時間内には書き込む
+const IDLE_TIMEOUT_MS = 1000
+const FALLBACK_DELAY_MS = 200
+
+// 最後に保存した状態。タスクの参照を比較して、変更されたタスクだけを書き込む
+let savedTasks/*ts*/: Task[]/*/ts*/ = []
+let savedById = new Map/*ts*/<number, Task>/*/ts*/()
+let pending = false
+
+function getStorage()/*ts*/: Storage | null/*/ts*/ {
+  if (typeof window === 'undefined') return null
+  try {
+    return window.localStorage
+  } catch {
+    return null
+  }
+}
+
+function resetStorage(storage/*ts*/: Storage/*/ts*/) {
+  const stale/*ts*/: string[]/*/ts*/ = []
+  for (let i = 0; i < storage.length; i++) {
+    const key = storage.key(i)
+    if (key && key.startsWith(`${PREFIX}:v`)) stale.push(key)
+  }
+  stale.forEach((key) => storage.removeItem(key))
+  storage.setItem(VERSION_KEY, String(SCHEMA_VERSION))
+}
+
+// ストアの作成時（最初の描画より前）に同期的に呼ばれる
+export function loadTasks()/*ts*/: Task[]/*/ts*/ {
+  const storage = getStorage()
+  if (!storage) return []
+  try {
+    if (storage.getItem(VERSION_KEY) !== String(SCHEMA_VERSION)) {
+      resetStorage(storage)
+      return []
+    }
+    const ids/*ts*/: number[]/*/ts*/ = JSON.parse(storage.getItem(INDEX_KEY) || '[]')
+    const tasks/*ts*/: Task[]/*/ts*/ = []
+    for (const id of ids) {
+      const raw = storage.getItem(itemKey(id))
+      if (raw) tasks.push(JSON.parse(raw))
+    }
+    savedTasks = tasks
+    savedById = new Map(tasks.map((task) => [task.id, task]))
+    return tasks
+  } catch (error) {
+    console.error('保存されたタスクの読み込みに失敗しました:', error)
+    return []
+  }
+}
+
+function flush(tasks/*ts*/: Task[]/*/ts*/) {
+  pending = false
+  const storage = getStorage()
+  if (!storage || tasks === savedTasks) return
+  try {
+    const nextById = new Map/*ts*/<number, Task>/*/ts*/()
+    let orderChanged = tasks.length !== savedTasks.length
+    tasks.forEach((task, i) => {
+      nextById.set(task.id, task)
+      // Redux Toolkit (Immer) は変更のないタスクの参照を保つため、参照が変わったものだけを書く
+      if (savedById.get(task.id) !== task) {
+        storage.setItem(itemKey(task.id), JSON.stringify(task))
+      }
+      if (!orderChanged && savedTasks[i].id !== task.id) orderChanged = true
+    })
+    savedById.forEach((_, id) => {
+      if (!nextById.has(id)) storage.removeItem(itemKey(id))
+    })
+    if (orderChanged) {
+      storage.setItem(INDEX_KEY, JSON.stringify(tasks.map((task) => task.id)))
+    }
+    savedTasks = tasks
+    savedById = nextById
+  } catch (error) {
+    console.error('タスクの保存に失敗しました:', error)
+  }
+}
+
+function scheduleFlush(getTasks/*ts*/: () => Task[]/*/ts*/) {
+  // 連続したdispatchは1回の書き込みにまとめる
+  if (pending) return
+  pending = true
+  const run = () => flush(getTasks())
+  if (typeof window.requestIdleCallback === 'function') {
+    window.requestIdleCallback(run, { timeout: IDLE_TIMEOUT_MS })
+  } else {
+    setTimeout(run, FALLBACK_DELAY_MS)
+  }
+}
+
+export const persistMiddleware/*ts*/: Middleware<{}, { tasks: Task[] }>/*/ts*/ = (storeApi) => {
+  if (typeof window !== 'undefined') {
+    // ページを離れる直前はアイドル時間を待たずに書き込む
+    window.addEventListener('pagehide', () => flush(storeApi.getState().tasks))
+  }
+  return (next) => (action) => {
+    const result = next(action)
+    if (typeof window !== 'undefined' && storeApi.getState().tasks !== savedTasks) {
+      scheduleFlush(() => storeApi.getState().tasks)
+    }
+    return result
+  }
+}
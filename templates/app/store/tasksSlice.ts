@@ -0,0 +1,46 @@
+import { createSlice/*ts*/, PayloadAction/*/ts*/ } from '@reduxjs/toolkit'
+/*if:persist*/
+import { loadTasks } from './persist'
+/*/if:persist*/
+
+/*ts*/
+/*if:persist*/export /*/if:persist*/interface Task {
+  id: number
+  title: string
+  completed: boolean
+}
+
+/*/ts*/
+/*unless:persist*/
+const initialState/*ts*/: Task[]/*/ts*/ = []
+
+let nextId = 1
+/*/unless:persist*/
+/*if:persist*/
+// localStorage から同期的に復元し、最初の描画から保存済みのタスクを表示する
+const initialState/*ts*/: Task[]/*/ts*/ = loadTasks()
+
+let nextId = initialState.reduce((max, task) => Math.max(max, task.id), 0) + 1
+/*/if:persist*/
+
+const tasksSlice = createSlice({
+  name: 'tasks',
+  initialState,
+  reducers: {
+    addTask: (state, action/*ts*/: PayloadAction<{ title: string }>/*/ts*/) => {
+      state.push({ id: nextId++, title: action.payload.title, completed: false })
+    },
+    toggleTask: (state, action/*ts*/: PayloadAction<number>/*/ts*/) => {
+      const task = state.find(task => task.id === action.payload)
+      if (task) {
+        task.completed = !task.completed
+      }
+    },
+    removeTask: (state, action/*ts*/: PayloadAction<number>/*/ts*/) => {
+      return state.filter(task => task.id !== action.payload)
+    },
+  },
+})
+
+export const { addTask, toggleTask, removeTask } = tasksSlice.actions
+export default tasksSlice.reducer
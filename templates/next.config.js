@@ -0,0 +1,10 @@
+// build.py から実行した場合は、cgroupの制限と同時実行数を考慮して割り当てたコア数だけワーカーを起動する
+// （Next.js は既定で os.cpus() の数だけワーカーを起動し、コンテナのCPU制限を考慮しない）
+const cpus = Number.parseInt(process.env.ZOLTRAAK_NODE_CPUS || '', 10)
+
+/** @type {import('next').NextConfig} */
+const nextConfig = {
+  experimental: cpus > 0 ? { cpus } : {},
+}
+
+module.exports = nextConfig
@@ -0,0 +1,235 @@
+import os
+import ctypes
+import ctypes.util
+import struct
+import asyncio
+from template_registry import template_root, clear_cache
+from create_project_files import project_templates, render_project_file, render_project_files
+from fonts import FONT_OUTPUT
+from events import emit, FILE_WRITTEN, WARNING, MESSAGE
+
+
+# inotify のイベントマスク（<sys/inotify.h> より）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+DEBOUNCE_SECONDS = 0.2
+POLL_INTERVAL = 0.5
+
+
+class InotifyWatcher:
+    # ctypes で libc の inotify を直接使う（追加の依存関係なし）
+    def __init__(self, directories, files, queue):
+        libc_name = ctypes.util.find_library('c')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 に失敗しました")
+        self.queue = queue
+        self.watches = {}
+        self.files = set(files)
+        self.file_watches = set()
+        for directory in directories:
+            self.add_tree(directory)
+        # 単体ファイルはアトミックな保存（リネーム）にも対応できるよう親ディレクトリを監視する
+        for directory in {os.path.dirname(path) for path in self.files}:
+            self.file_watches.add(self.add_watch(directory))
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch に失敗しました: {directory}")
+        self.watches[wd] = directory
+        return wd
+
+    def add_tree(self, directory):
+        for root, dirs, _ in os.walk(directory):
+            dirs[:] = [d for d in dirs if d != '__pycache__']
+            self.add_watch(root)
+
+    def start(self, loop):
+        loop.add_reader(self.fd, self.read_events)
+
+    def read_events(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode()
+            offset += length
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if wd in self.file_watches:
+                if path in self.files:
+                    self.queue.put_nowait(path)
+                continue
+            if mask & IN_ISDIR:
+                # 新しく作られたディレクトリも監視対象に加える
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                continue
+            self.queue.put_nowait(path)
+
+    def close(self, loop):
+        loop.remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # inotify が使えない環境向けに mtime とサイズを定期的に比較する
+    def __init__(self, directories, files, queue, interval=POLL_INTERVAL):
+        self.directories = directories
+        self.files = files
+        self.queue = queue
+        self.interval = interval
+        self.snapshot = self.scan()
+        self.task = None
+
+    def scan(self):
+        paths = list(self.files)
+        for directory in self.directories:
+            for root, dirs, files in os.walk(directory):
+                dirs[:] = [d for d in dirs if d != '__pycache__']
+                paths.extend(os.path.join(root, name) for name in files)
+        snapshot = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            snapshot = self.scan()
+            for path in snapshot.keys() | self.snapshot.keys():
+                if snapshot.get(path) != self.snapshot.get(path):
+                    self.queue.put_nowait(path)
+            self.snapshot = snapshot
+
+    def start(self, loop):
+        self.task = loop.create_task(self.run())
+
+    def close(self, loop):
+        if self.task:
+            self.task.cancel()
+
+
+def create_watcher(directories, files, queue, use_polling=False):
+    if not use_polling:
+        try:
+            return InotifyWatcher(directories, files, queue)
+        except (OSError, AttributeError, TypeError) as e:
+            emit(WARNING, message=f"inotify を使用できないためポーリングで監視します: {e}")
+    return PollingWatcher(directories, files, queue)
+
+
+async def debounce(queue, delay=DEBOUNCE_SECONDS):
+    # 最初の変更を待ち、その後 delay 秒間新しい変更がなくなるまでまとめて受け取る
+    changed = {await queue.get()}
+    while True:
+        try:
+            changed.add(await asyncio.wait_for(queue.get(), delay))
+        except asyncio.TimeoutError:
+            return changed
+
+
+def affected_outputs(changed, templates_dir, env_source, features=()):
+    # 変更されたソースから再生成が必要な出力を求める
+    names = set(project_templates(features))
+    templates = set()
+    env_changed = False
+    for path in changed:
+        path = os.path.abspath(path)
+        if path == env_source:
+            env_changed = True
+            continue
+        relative = os.path.relpath(path, templates_dir).replace(os.sep, '/')
+        if relative in names:
+            templates.add(relative)
+    return sorted(templates), env_changed
+
+
+def write_if_changed(path, content):
+    # 内容が同じファイルは書き込まない（不要なHMRを発生させない）
+    binary = 'b' if isinstance(content, bytes) else ''
+    try:
+        with open(path, 'r' + binary) as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w' + binary) as f:
+        f.write(content)
+    return True
+
+
+def regenerate(templates, env_changed, env_source, USE_TYPESCRIPT, features=(), font_source=None):
+    written = []
+    if templates:
+        clear_cache()
+    for name in templates:
+        # 削除・リネームされたテンプレートや書き込めないファイルがあっても監視は続ける
+        try:
+            path, content = render_project_file(name, USE_TYPESCRIPT, features)
+            if write_if_changed(path, content):
+                written.append(path)
+        except (OSError, ValueError) as e:
+            emit(WARNING, message=f"テンプレート '{name}' を再生成できませんでした: {e}")
+    if templates and 'local_font' in features:
+        # サブセットは全テンプレートの文字から作るため、どのテンプレートが変わっても作り直す（文字集合が同じならキャッシュを使う）
+        try:
+            font = render_project_files(USE_TYPESCRIPT, features, font_source)[FONT_OUTPUT]
+            if write_if_changed(FONT_OUTPUT, font):
+                written.append(FONT_OUTPUT)
+        except (OSError, ValueError) as e:
+            emit(WARNING, message=f"フォント '{FONT_OUTPUT}' を再生成できませんでした: {e}")
+    if env_changed and os.path.exists(env_source):
+        try:
+            with open(env_source, 'r') as f:
+                if write_if_changed('.env.local', f.read()):
+                    written.append('.env.local')
+        except OSError as e:
+            emit(WARNING, message=f".env.local を更新できませんでした: {e}")
+    return written
+
+
+async def watch_project(USE_TYPESCRIPT, env_source='../.env.local', use_polling=False, features=(), font_source=None):
+    # カレントディレクトリ（生成先プロジェクト）に対して、テンプレートと .env.local の変更を反映し続ける
+    templates_dir = template_root()
+    env_source = os.path.abspath(env_source)
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    watcher = create_watcher([templates_dir], [env_source], queue, use_polling)
+    watcher.start(loop)
+    emit(MESSAGE, level='info', text=f"テンプレート ({templates_dir}) と {env_source} の変更を監視しています...")
+    try:
+        while True:
+            changed = await debounce(queue)
+            templates, env_changed = affected_outputs(changed, templates_dir, env_source, features)
+            if not templates and not env_changed:
+                continue
+            written = regenerate(templates, env_changed, env_source, USE_TYPESCRIPT, features, font_source)
+            for path in written:
+                emit(FILE_WRITTEN, path=path, regenerated=True)
+    finally:
+        watcher.close(loop)